@@ -0,0 +1,68 @@
+# app/core/batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects requests that arrive within a short window (or up to max_batch of
+    them) and hands them to process() together on one worker thread.
+    Subclasses implement process(batch), where batch is a list of
+    (item, future) pairs, and resolve every future in it.
+    """
+
+    def __init__(self, name: str, max_batch: int, window_ms: int):
+        self.name = name
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.batches = 0
+        self.batched_requests = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def process(self, batch: list[tuple[object, Future]]):
+        raise NotImplementedError
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.batches += 1
+            self.batched_requests += len(batch)
+            try:
+                self.process(batch)
+            except Exception as e:
+                # Keep the worker alive; nobody should wait on a batch that failed.
+                print(f"❌ {self.name} batcher: Batch failed. Error: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def stats(self) -> dict:
+        avg = self.batched_requests / self.batches if self.batches else 0.0
+        return {
+            "batches": self.batches,
+            "requests": self.batched_requests,
+            "avg_batch_size": round(avg, 2),
+            "occupancy": round(avg / self.max_batch, 3) if self.batches else 0.0,
+        }
@@ -0,0 +1,160 @@
+# app/core/config.py
+import os
+from dotenv import load_dotenv
+
+# Values can be overridden through environment variables or a local .env file.
+load_dotenv()
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- PIPELINE STAGE LIMITS ---
+# Whisper is CPU-bound, so it runs in its own processes. Keep this at or below
+# the number of physical cores left over after the embedding model.
+WHISPER_WORKERS = _int("WHISPER_WORKERS", 1)
+# Google Translate and gTTS are network-bound; threads are enough.
+TRANSLATION_WORKERS = _int("TRANSLATION_WORKERS", 8)
+TTS_WORKERS = _int("TTS_WORKERS", 4)
+# Number of generations Ollama is allowed to run at once (match OLLAMA_NUM_PARALLEL).
+LLM_CONCURRENCY = _int("LLM_CONCURRENCY", 2)
+# Answer-cache lookups and retrieval run on their own threads before a
+# question takes an LLM slot. These mostly wait on the retrieval batcher, so
+# keep this at least RETRIEVAL_MAX_BATCH or batches can never fill.
+RETRIEVAL_WORKERS = _int("RETRIEVAL_WORKERS", 32)
+
+# --- ADMISSION CONTROL ---
+# Chat requests admitted at the same time, across all stages.
+MAX_IN_FLIGHT_REQUESTS = _int("MAX_IN_FLIGHT_REQUESTS", 32)
+# Requests allowed to wait for an LLM slot before new ones are turned away.
+LLM_MAX_QUEUE = _int("LLM_MAX_QUEUE", 8)
+# Bounds for the Retry-After header sent with a 503.
+RETRY_AFTER_MIN_SECONDS = _int("RETRY_AFTER_MIN_SECONDS", 1)
+RETRY_AFTER_MAX_SECONDS = _int("RETRY_AFTER_MAX_SECONDS", 60)
+# Identical concurrent chat requests (same query, language and mode, or the
+# same audio) share one computation.
+SINGLE_FLIGHT = _bool("SINGLE_FLIGHT", True)
+
+# --- ANSWER CACHE (rag_service) ---
+ANSWER_CACHE_ENABLED = _bool("ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_MAX_ENTRIES = _int("ANSWER_CACHE_MAX_ENTRIES", 2048)
+# 0 disables expiry; answers only change when the vector store is rebuilt.
+ANSWER_CACHE_TTL_SECONDS = _int("ANSWER_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+# Cosine similarity above which two RAG questions share an answer. Set to 0 to
+# disable the embedding tier and keep only exact matches.
+ANSWER_CACHE_SIMILARITY = _float("ANSWER_CACHE_SIMILARITY", 0.95)
+# Optional SQLite file so cached answers survive restarts. Empty = memory only.
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "")
+
+# --- TRANSLATION (translation_service) ---
+# "google" for Google Translate, "identity" for an offline stand-in.
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "google")
+TRANSLATION_CACHE_MAX_ENTRIES = _int("TRANSLATION_CACHE_MAX_ENTRIES", 20000)
+# SQLite file backing the in-memory cache. Empty = memory only.
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "cache/translations.sqlite3")
+
+# --- TEXT-TO-SPEECH (audio_service) ---
+# "gtts" for Google TTS, "silent" for an offline stand-in that returns no audio.
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")
+# Content-addressed MP3 files, one per (language, sentence). Empty = no disk tier.
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "cache/tts")
+TTS_CACHE_MAX_BYTES = _int("TTS_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+TTS_CACHE_MEMORY_ENTRIES = _int("TTS_CACHE_MEMORY_ENTRIES", 512)
+# Synthesize the fixed fallback/greeting phrases in every language at startup.
+TTS_PREWARM = _bool("TTS_PREWARM", True)
+# Deferred audio (audio_mode=deferred): how long an answer's audio ID can be
+# fetched, and where pending IDs are kept so every API worker can serve them.
+DEFERRED_AUDIO_TTL_SECONDS = _int("DEFERRED_AUDIO_TTL_SECONDS", 24 * 60 * 60)
+DEFERRED_AUDIO_MAX_ENTRIES = _int("DEFERRED_AUDIO_MAX_ENTRIES", 10000)
+DEFERRED_AUDIO_PATH = os.getenv("DEFERRED_AUDIO_PATH", "cache/deferred_audio.sqlite3")
+# Start synthesizing deferred audio as soon as the text has been returned,
+# instead of when it is first requested.
+DEFERRED_AUDIO_PREFETCH = _bool("DEFERRED_AUDIO_PREFETCH", False)
+
+# Language codes offered by the Streamlit client.
+SUPPORTED_LANGUAGES = os.getenv("SUPPORTED_LANGUAGES", "en,hi,kn,ta,te,ml").split(",")
+
+# --- SPEECH-TO-TEXT (audio_service) ---
+# Micro-batch concurrent audio requests through one Whisper model in this
+# process instead of sending each one to the Whisper process pool.
+WHISPER_BATCHING = _bool("WHISPER_BATCHING", False)
+WHISPER_MAX_BATCH = _int("WHISPER_MAX_BATCH", 8)
+# How long the first request in a batch waits for others to join.
+WHISPER_BATCH_WINDOW_MS = _int("WHISPER_BATCH_WINDOW_MS", 50)
+
+# --- STARTUP ---
+# Load models in a background task at startup instead of on the first request.
+WARM_UP_ON_STARTUP = _bool("WARM_UP_ON_STARTUP", True)
+# Ask Ollama to load the model weights during warm-up.
+LLM_WARMUP = _bool("LLM_WARMUP", True)
+
+# --- RETRIEVAL (rag_service) ---
+# Chunks passed to the LLM.
+RETRIEVAL_K = _int("RETRIEVAL_K", 2)
+# Combine dense (Chroma) and BM25 results, and answer "Section N(M)" lookups
+# from the section index. Needs vector_store/lexical_index.json from ingestion.
+HYBRID_RETRIEVAL = _bool("HYBRID_RETRIEVAL", True)
+# Candidates fetched from each retriever before fusion.
+RETRIEVAL_FETCH_K = _int("RETRIEVAL_FETCH_K", 8)
+# Reciprocal rank fusion constant; larger values flatten the rank weighting.
+RRF_K = _int("RRF_K", 60)
+# Dense searches from concurrent questions are embedded in one batch and run
+# as one multi-query vector search. The cap and window work as for Whisper
+# batching, with a much shorter window.
+RETRIEVAL_BATCHING = _bool("RETRIEVAL_BATCHING", True)
+RETRIEVAL_MAX_BATCH = _int("RETRIEVAL_MAX_BATCH", 32)
+RETRIEVAL_BATCH_WINDOW_MS = _int("RETRIEVAL_BATCH_WINDOW_MS", 5)
+# "chroma" opens the Chroma store; "compact" memory-maps the flat index that
+# ingestion writes to vector_store/compact_index (faster to open and search
+# for a corpus of a few Acts).
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+# Precision ingestion stores the compact index's vectors at: "float16" or "int8".
+COMPACT_INDEX_DTYPE = os.getenv("COMPACT_INDEX_DTYPE", "float16")
+
+# --- EMBEDDINGS (embedding_service, shared by the API and ingestion) ---
+# Changing the model requires re-running ingestion with --rebuild.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+# "huggingface" (PyTorch, full precision) or "onnx" (ONNX Runtime, int8-quantized).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+# Where the exported and quantized ONNX model is kept.
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/onnx")
+EMBEDDING_BATCH_SIZE = _int("EMBEDDING_BATCH_SIZE", 64)
+# Query embeddings kept in memory; repeated questions skip the model entirely.
+QUERY_EMBEDDING_CACHE_SIZE = _int("QUERY_EMBEDDING_CACHE_SIZE", 4096)
+
+# --- TELEMETRY (core/telemetry) ---
+# Requests slower than this are logged with their full stage breakdown.
+SLOW_REQUEST_SECONDS = _float("SLOW_REQUEST_SECONDS", 10.0)
+# Expose Prometheus metrics at /metrics.
+METRICS_ENABLED = _bool("METRICS_ENABLED", True)
+
+# --- CONVERSATIONS (rag_service) ---
+# Conversations kept in memory, and how long an idle one survives.
+SESSION_MAX_ENTRIES = _int("SESSION_MAX_ENTRIES", 10000)
+SESSION_TTL_SECONDS = _int("SESSION_TTL_SECONDS", 2 * 60 * 60)
+# Rough token budget for past turns in the prompt. Once the turns exceed it
+# the oldest are folded into a running summary, down to half the budget.
+HISTORY_TOKEN_BUDGET = _int("HISTORY_TOKEN_BUDGET", 1024)
+# Context window requested from Ollama; it must hold the instructions, the
+# history, the retrieved chunks and the answer.
+LLM_NUM_CTX = _int("LLM_NUM_CTX", 4096)
+# How long Ollama keeps the model (and its prompt cache) loaded between requests.
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+
+# --- MODEL HOST (services/model_host) ---
+# When set, API workers use Whisper, the embedding model and the vector store
+# through the model-host process listening on this Unix socket instead of
+# loading their own copies. Start it with `python -m app.services.model_host`.
+MODEL_HOST_SOCKET = os.getenv("MODEL_HOST_SOCKET", "")
+# Shared secret for the socket handshake. When empty, the host generates one
+# into "<socket>.key" (mode 0600) for API workers running as the same user.
+MODEL_HOST_AUTHKEY = os.getenv("MODEL_HOST_AUTHKEY", "")
@@ -0,0 +1,151 @@
+# app/core/executors.py
+import asyncio
+import contextvars
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from . import config
+from .registry import registry
+
+
+class Overloaded(Exception):
+    """Raised when a request is turned away by admission control."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server is busy, retry after {retry_after}s.")
+        self.retry_after = retry_after
+
+
+def _warm_whisper():
+    # Runs once in each Whisper worker process so the model is loaded
+    # before the first request reaches it.
+    from ..services import audio_service
+    audio_service.get_whisper_model()
+
+
+class Stage:
+    """
+    A bounded executor for one step of the chat pipeline.
+    Keeps track of how many calls are waiting or running, and how long a
+    call usually takes, so admission control can estimate queueing delay.
+    """
+
+    def __init__(self, name: str, workers: int, kind: str = "thread"):
+        self.name = name
+        self.workers = max(1, workers)
+        self.kind = kind
+        self.pending = 0
+        self.avg_seconds = 0.0
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        # Created on first use so importing the app doesn't spawn processes.
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_warm_whisper,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix=f"{self.name}-stage"
+                    )
+            return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn on this stage's executor without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        start = time.perf_counter()
+        call = partial(fn, *args, **kwargs)
+        if self.kind == "thread":
+            # Carry the request's context (e.g. its trace) into the worker thread.
+            call = partial(contextvars.copy_context().run, call)
+        try:
+            return await loop.run_in_executor(self.executor, call)
+        finally:
+            self.pending -= 1
+            elapsed = time.perf_counter() - start
+            # Exponentially weighted so the estimate follows recent load.
+            self.avg_seconds = elapsed if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * elapsed
+
+    def estimated_wait(self) -> float:
+        """Seconds a new call would roughly wait before it completes."""
+        return math.ceil(self.pending / self.workers) * (self.avg_seconds or 1.0)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# With a model host, Whisper runs there and this stage only waits on the socket.
+WHISPER = Stage("whisper", config.WHISPER_WORKERS, kind="thread" if config.MODEL_HOST_SOCKET else "process")
+TRANSLATION = Stage("translation", config.TRANSLATION_WORKERS)
+TTS = Stage("tts", config.TTS_WORKERS)
+RETRIEVAL = Stage("retrieval", config.RETRIEVAL_WORKERS)
+LLM = Stage("llm", config.LLM_CONCURRENCY)
+
+STAGES = {stage.name: stage for stage in (WHISPER, TRANSLATION, TTS, RETRIEVAL, LLM)}
+
+
+class AdmissionController:
+    """
+    Turns requests away early (503 + Retry-After) instead of letting them
+    queue up until they time out. A request is rejected when too many are
+    already in flight or when the LLM stage's queue is full.
+    """
+
+    def __init__(self, max_in_flight: int, llm_max_queue: int):
+        self.max_in_flight = max_in_flight
+        self.llm_max_queue = llm_max_queue
+        self.in_flight = 0
+
+    def retry_after(self) -> int:
+        wait = LLM.estimated_wait()
+        return int(min(config.RETRY_AFTER_MAX_SECONDS, max(config.RETRY_AFTER_MIN_SECONDS, math.ceil(wait))))
+
+    def acquire(self):
+        """Admits one request or raises Overloaded. Must be paired with release()."""
+        llm_queued = max(0, LLM.pending - LLM.workers)
+        if self.in_flight >= self.max_in_flight or llm_queued >= self.llm_max_queue:
+            raise Overloaded(self.retry_after())
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "stages": {name: {"pending": s.pending, "workers": s.workers, "avg_seconds": round(s.avg_seconds, 3)}
+                       for name, s in STAGES.items()},
+        }
+
+
+admission = AdmissionController(config.MAX_IN_FLIGHT_REQUESTS, config.LLM_MAX_QUEUE)
+
+
+def warm_whisper_pool() -> list[int]:
+    """Starts every Whisper worker process and waits until each has loaded the model."""
+    futures = [WHISPER.executor.submit(os.getpid) for _ in range(WHISPER.workers)]
+    return sorted({future.result() for future in futures})
+
+
+registry.register("whisper_pool", warm_whisper_pool)
+
+
+def shutdown():
+    for stage in STAGES.values():
+        stage.shutdown()
@@ -0,0 +1,95 @@
+# app/core/registry.py
+import threading
+import time
+
+
+class Component:
+    """One heavy resource (model, client, index) and its load state."""
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader
+        self.value = None
+        self.status = "not_loaded"  # not_loaded -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self.lock = threading.Lock()
+
+    def as_dict(self) -> dict:
+        info = {"status": self.status}
+        if self.load_seconds is not None:
+            info["load_seconds"] = round(self.load_seconds, 3)
+        if self.error:
+            info["error"] = self.error
+        return info
+
+
+class ModelRegistry:
+    """
+    Loads heavy resources on first use (or in a background warm-up) instead
+    of at import time, and records per-component readiness and load time.
+    """
+
+    def __init__(self):
+        self._components: dict[str, Component] = {}
+        self._warm_up_thread = None
+
+    def register(self, name: str, loader):
+        """Registers a zero-argument loader. Re-registering replaces the loader."""
+        self._components[name] = Component(name, loader)
+
+    def get(self, name: str):
+        """Returns the resource, loading it first if needed. Raises if loading fails."""
+        component = self._components[name]
+        if component.status == "ready":
+            return component.value
+        with component.lock:
+            if component.status != "ready":
+                component.status = "loading"
+                start = time.perf_counter()
+                try:
+                    component.value = component.loader()
+                except Exception as e:
+                    component.status = "failed"
+                    component.error = str(e)
+                    print(f"❌ Registry: Failed to load '{name}'. Error: {e}")
+                    raise
+                component.load_seconds = time.perf_counter() - start
+                component.error = None
+                component.status = "ready"
+                print(f"✅ Registry: '{name}' ready in {component.load_seconds:.2f}s")
+        return component.value
+
+    def override(self, name: str, value):
+        """Installs a ready-made resource, e.g. a stand-in for tests or benchmarks."""
+        component = self._components.setdefault(name, Component(name, None))
+        with component.lock:
+            component.value = value
+            component.status = "ready"
+            component.error = None
+            component.load_seconds = 0.0
+
+    def warm_up(self, names: list[str]):
+        """Loads the given components in order, logging (not raising) failures."""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+    def start_warm_up(self, names: list[str]):
+        """Runs warm_up in a background thread so the server can start serving."""
+        self._warm_up_thread = threading.Thread(
+            target=self.warm_up, args=(names,), name="model-warm-up", daemon=True
+        )
+        self._warm_up_thread.start()
+
+    def is_ready(self, names: list[str]) -> bool:
+        return all(name in self._components and self._components[name].status == "ready" for name in names)
+
+    def status(self, names: list[str] = None) -> dict:
+        names = names or list(self._components)
+        return {name: self._components[name].as_dict() for name in names if name in self._components}
+
+
+registry = ModelRegistry()
@@ -0,0 +1,47 @@
+# app/core/singleflight.py
+import asyncio
+from typing import Awaitable, Callable
+
+from . import telemetry
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller starts the
+    work, later callers with the same key wait for the same result (or
+    exception) instead of repeating it.
+
+    Waiters are shielded from the shared task, so a caller that is cancelled
+    (e.g. its client disconnected) stops waiting without cancelling the work
+    for everyone else. If every caller goes away the work still finishes and
+    its result lands in the downstream caches.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        """Returns (result, coalesced)."""
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced += 1
+            telemetry.COALESCED_REQUESTS.labels(self.name).inc()
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), coalesced
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every waiter left.
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._in_flight), "started": self.started, "coalesced": self.coalesced}
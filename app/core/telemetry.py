@@ -0,0 +1,236 @@
+# app/core/telemetry.py
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from . import config
+
+# --- METRICS ---
+# Buckets span a cached answer (~10 ms) to a cold CPU-only generation (~2 min).
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+
+REQUEST_SECONDS = Histogram(
+    "legal_aid_request_seconds", "End-to-end request latency.",
+    ["endpoint", "mode", "language"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "legal_aid_stage_seconds", "Latency of one pipeline stage, including queueing.",
+    ["stage", "mode", "language"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("legal_aid_requests_in_flight", "Requests currently being handled.", ["endpoint"])
+STAGE_PENDING = Gauge("legal_aid_stage_pending", "Calls waiting for or running on a pipeline stage.", ["stage"])
+ERRORS = Counter("legal_aid_errors_total", "Failed requests.", ["endpoint", "mode", "language", "kind"])
+SLOW_REQUESTS = Counter("legal_aid_slow_requests_total", "Requests slower than SLOW_REQUEST_SECONDS.", ["endpoint"])
+RETRIEVED_CHUNKS = Histogram(
+    "legal_aid_retrieved_chunks", "Chunks returned by the retriever.", buckets=(0, 1, 2, 4, 8, 16, 32),
+)
+LLM_TOKENS = Counter("legal_aid_llm_tokens_total", "Tokens processed by the LLM.", ["mode", "kind"])
+RETRIEVAL_BATCH_SIZE = Histogram(
+    "legal_aid_retrieval_batch_size", "Queries per batched dense search.", buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+COALESCED_REQUESTS = Counter(
+    "legal_aid_coalesced_requests_total", "Requests that shared another request's in-flight work.", ["flight"],
+)
+
+SUPPORTED_LANGUAGES = frozenset(config.SUPPORTED_LANGUAGES)
+
+
+def _language_label(language: str) -> str:
+    # Labels come from user input; keep the series count bounded.
+    return language if language in SUPPORTED_LANGUAGES else "other"
+
+
+# --- TRACES ---
+
+class Trace:
+    """
+    Timing spans and attributes for one request. Spans are recorded from the
+    event loop and from stage worker threads, so appends take a lock.
+    """
+
+    def __init__(self, endpoint: str, mode: str, language: str):
+        self.endpoint = endpoint
+        self.mode = mode
+        self.language = _language_label(language)
+        self.started = time.perf_counter()
+        self.spans: list[dict] = []
+        self.attributes: dict = {}
+        self.error: str | None = None
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, seconds: float, **attributes):
+        span = {"name": name, "offset_s": round(start - self.started, 4), "seconds": round(seconds, 4)}
+        if attributes:
+            span.update(attributes)
+        with self._lock:
+            self.spans.append(span)
+        STAGE_SECONDS.labels(name, self.mode, self.language).observe(seconds)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, **attributes)
+
+    def set(self, **attributes):
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "endpoint": self.endpoint,
+                "mode": self.mode,
+                "language": self.language,
+                "seconds": round(time.perf_counter() - self.started, 4),
+                "error": self.error,
+                "attributes": dict(self.attributes),
+                "spans": sorted(self.spans, key=lambda span: span["offset_s"]),
+            }
+
+
+# Stage.run copies the context into worker threads, so code running on a
+# stage (rag_service, the LangChain callbacks) sees the request's trace.
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+def start_trace(endpoint: str, mode: str, language: str) -> Trace:
+    trace = Trace(endpoint, mode, language)
+    REQUESTS_IN_FLIGHT.labels(endpoint).inc()
+    return trace
+
+
+def finish_trace(trace: Trace, error: str | None = None):
+    """Records the request's metrics and logs it if it was slow."""
+    seconds = time.perf_counter() - trace.started
+    REQUESTS_IN_FLIGHT.labels(trace.endpoint).dec()
+    REQUEST_SECONDS.labels(trace.endpoint, trace.mode, trace.language).observe(seconds)
+    if error:
+        trace.error = error
+        ERRORS.labels(trace.endpoint, trace.mode, trace.language, error).inc()
+    if seconds >= config.SLOW_REQUEST_SECONDS:
+        SLOW_REQUESTS.labels(trace.endpoint).inc()
+        print(f"🐢 Telemetry: Slow request ({seconds:.1f}s): {json.dumps(trace.as_dict(), ensure_ascii=False)}")
+
+
+def error_kind(exc: BaseException) -> str:
+    status = getattr(exc, "status_code", None)
+    return f"http_{status}" if status else type(exc).__name__
+
+
+@contextmanager
+def request_trace(endpoint: str, mode: str, language: str):
+    trace = start_trace(endpoint, mode, language)
+    token = current_trace.set(trace)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = error_kind(e)
+        raise
+    finally:
+        current_trace.reset(token)
+        finish_trace(trace, error)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """A span on the current request's trace; does nothing outside a request."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, **attributes):
+        yield
+
+
+def set_attributes(**attributes):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.set(**attributes)
+
+
+def track_stages(stages: dict):
+    """Exports each executor stage's queue depth as a gauge."""
+    for name, stage in stages.items():
+        STAGE_PENDING.labels(name).set_function(lambda stage=stage: stage.pending)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# --- LANGCHAIN ---
+
+class TelemetryCallback(BaseCallbackHandler):
+    """
+    Turns LangChain retriever and LLM events into spans on the current trace:
+    retrieval time and chunk count, generation time, time to first token and
+    Ollama's prompt/response token counts.
+    """
+
+    def __init__(self):
+        self._started: dict = {}
+
+    def _start(self, run_id):
+        self._started[run_id] = (time.perf_counter(), False)
+
+    def _finish(self, run_id, name: str, **attributes):
+        started = self._started.pop(run_id, None)
+        trace = current_trace.get()
+        if started is None or trace is None:
+            return
+        trace.record(name, started[0], time.perf_counter() - started[0], **attributes)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        RETRIEVED_CHUNKS.observe(len(documents))
+        set_attributes(retrieved_chunks=len(documents))
+        self._finish(run_id, "retrieval", chunks=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "retrieval", error=type(error).__name__)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        started = self._started.get(run_id)
+        if started is not None and not started[1]:
+            self._started[run_id] = (started[0], True)
+            set_attributes(first_token_s=round(time.perf_counter() - started[0], 4))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        info = {}
+        for generations in response.generations:
+            for generation in generations:
+                info.update(generation.generation_info or {})
+        tokens = {}
+        if "prompt_eval_count" in info:
+            tokens["prompt_tokens"] = info["prompt_eval_count"]
+        if "eval_count" in info:
+            tokens["response_tokens"] = info["eval_count"]
+        trace = current_trace.get()
+        if trace is not None:
+            if "prompt_tokens" in tokens:
+                LLM_TOKENS.labels(trace.mode, "prompt").inc(tokens["prompt_tokens"])
+            if "response_tokens" in tokens:
+                LLM_TOKENS.labels(trace.mode, "response").inc(tokens["response_tokens"])
+            trace.set(**tokens)
+        self._finish(run_id, "generation", **tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "generation", error=type(error).__name__)
+
+
+# Passed as `config={"callbacks": CALLBACKS}` to every chain/LLM invocation.
+CALLBACKS = [TelemetryCallback()]
@@ -0,0 +1,103 @@
+# app/core/text_utils.py
+import re
+
+# A sentence ends at ., !, ? or the Devanagari danda, followed by whitespace.
+# Newlines (bullet points, numbered lists) are treated as boundaries too.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?।])\s+|\n+")
+
+# A period after one of these does not end the sentence ("Rs. 10", "Sec. 6",
+# "i.e. the PIO"). Compared lower-case, without the final period.
+ABBREVIATIONS = frozenset(
+    "rs re sec secs s ss art cl ch para govt dept dist vol pp i.e e.g viz vs etc approx "
+    "dr mr mrs ms smt shri sri jr sr st hon ltd pvt co inc".split()
+)
+# "No." is also an ordinary word; it is only an abbreviation before a number ("No. 5").
+NUMBER_ABBREVIATIONS = frozenset({"no", "nos"})
+# The last word before a period, e.g. "Rs" in "The fee is Rs."
+LAST_WORD = re.compile(r"([\w.]+)\.$")
+# A list marker on its own: "1.", "12.", "a.", "iv."
+LIST_MARKER = re.compile(r"^(?:\d{1,3}|[a-z]|[ivx]{1,4})\.$", re.IGNORECASE)
+
+# Very short fragments ("1.", "a)") are merged into the next sentence so we
+# don't send one-word requests to the translator or to gTTS.
+MIN_SENTENCE_CHARS = 20
+
+
+def split_sentences(text: str) -> list[str]:
+    """Splits a block of text into sentences, merging very short fragments."""
+    splitter = SentenceSplitter()
+    return splitter.feed(text or "") + splitter.flush()
+
+
+def _ends_sentence(text: str, match: re.Match) -> bool:
+    """Whether a boundary match really ends the sentence in `text` before it."""
+    if "\n" in match.group():
+        return True
+    before = text[:match.start()]
+    if not before.endswith("."):
+        return True
+    if LIST_MARKER.match(before.split("\n")[-1].strip()):
+        return False
+    word = LAST_WORD.search(before)
+    word = word.group(1).lower().lstrip(".") if word else ""
+    if word in NUMBER_ABBREVIATIONS:
+        return not text[match.end()].isdigit()
+    return word not in ABBREVIATIONS
+
+
+class SentenceSplitter:
+    """
+    Incrementally cuts a token stream into complete sentences.
+    Feed it tokens as they arrive; it returns any sentences that are finished.
+    separators[i] is the whitespace that followed sentence i ("\\n" for a line
+    break, " " otherwise, "" after the last one), so callers can rejoin the
+    sentences (or their translations) with the original line structure.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.separators = []
+
+    def _boundary(self, start: int = 0):
+        for match in SENTENCE_BOUNDARY.finditer(self.buffer, start):
+            if match.end() == len(self.buffer):
+                # The whitespace may go on ("\n\n"), and "No. " depends on what follows.
+                return None
+            if _ends_sentence(self.buffer, match):
+                return match
+        return None
+
+    def feed(self, token: str) -> list[str]:
+        self.buffer += token
+        sentences = []
+        while True:
+            match = self._boundary()
+            if not match:
+                break
+            candidate = self.buffer[:match.start()].strip()
+            if len(candidate) < MIN_SENTENCE_CHARS:
+                # Too short to stand on its own; wait for more text unless
+                # there is another boundary further along to merge with.
+                next_match = self._boundary(match.end())
+                if not next_match:
+                    break
+                candidate = self.buffer[:next_match.start()].strip()
+                match = next_match
+            if candidate:
+                sentences.append(candidate)
+                self.separators.append("\n" * match.group().count("\n") or " ")
+            self.buffer = self.buffer[match.end():]
+        return sentences
+
+    def flush(self) -> list[str]:
+        """Returns whatever is left in the buffer as a final sentence."""
+        remainder = self.buffer.strip()
+        self.buffer = ""
+        if not remainder:
+            return []
+        self.separators.append("")
+        return [remainder]
+
+    def join(self, sentences: list[str]) -> str:
+        """Rejoins sentences (or their translations) in order with the separators they were cut at."""
+        return "".join(sentence + separator for sentence, separator in zip(sentences, self.separators)).strip()
@@ -1,10 +1,21 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException, Form, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Form, File, UploadFile, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from typing import Optional
+import asyncio
 import json
 import base64
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import deque
 
+from .core import config, executors, telemetry
+from .core.executors import Overloaded
+from .core.registry import registry
+from .core.singleflight import SingleFlight
+from .core.text_utils import SentenceSplitter
 from .services import rag_service, translation_service, audio_service, location_service
 
 # ---> THIS IS THE "app" OBJECT THAT THE ERROR WAS MISSING <---
@@ -13,58 +24,521 @@ app = FastAPI(
     version="2.0.0"
 )
 
+chat_flights = SingleFlight("chat")
+audio_flights = SingleFlight("audio")
+# "inline" returns the answer's MP3 in the response; "deferred" returns an
+# audio ID to fetch from /v2/audio/{id} only if the user wants to listen.
+AUDIO_MODES = ("inline", "deferred")
+# Deferred audio is content-addressed, so a response never changes.
+AUDIO_CACHE_CONTROL = "private, max-age=86400, immutable"
+_background_tasks = set()
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+def _speech_component() -> str:
+    # With batching or a model host, "whisper" is in this process (a proxy in
+    # the latter case); otherwise the model lives in the worker pool.
+    return "whisper" if config.WHISPER_BATCHING or config.MODEL_HOST_SOCKET else "whisper_pool"
+
+def _ready_components() -> list[str]:
+    return rag_service.WARM_UP_COMPONENTS + [_speech_component()]
+
+def _mode_label(mode: str) -> str:
+    # Metric labels come from user input; keep the series count bounded.
+    return mode if mode in rag_service.MODES else "other"
+
+@app.on_event("startup")
+def track_stage_queues():
+    telemetry.track_stages(executors.STAGES)
+
+@app.on_event("startup")
+def warm_up_models():
+    if config.WARM_UP_ON_STARTUP:
+        registry.start_warm_up(_ready_components())
+
+@app.on_event("startup")
+def prewarm_tts_cache():
+    if config.TTS_PREWARM:
+        # Runs in the background so startup isn't held up by gTTS round trips.
+        threading.Thread(target=audio_service.prewarm, name="tts-prewarm", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    executors.shutdown()
+
 @app.post("/v2/chat")
 async def chat_endpoint(
     text_query: Optional[str] = Form(None),
     language: str = Form("en"),
     mode: str = Form("General Chat"),
+    session_id: Optional[str] = Form(None),
+    audio_mode: str = Form("inline"),
     audio_file: Optional[UploadFile] = File(None)
 ):
     """
     Handles text and audio queries, translation, and dual-mode chat.
+    Pass a session_id to continue a conversation, and audio_mode=deferred to
+    get the text without waiting for speech synthesis. Identical concurrent
+    requests share one computation.
     """
+    _check_audio_mode(audio_mode)
+    audio_bytes = await audio_file.read() if audio_file else b""
+    history = rag_service.sessions.history(session_id)
+    with telemetry.request_trace("chat", _mode_label(mode), language) as trace:
+        if config.SINGLE_FLIGHT:
+            key = f"{audio_mode}:{_flight_key(text_query, language, mode, audio_bytes)}"
+            if history:
+                # A follow-up's answer depends on its own conversation.
+                key = f"{key}:{session_id}"
+            result, coalesced = await chat_flights.do(key, lambda: _answer(text_query, language, mode, audio_bytes, history, audio_mode))
+            if coalesced:
+                trace.set(coalesced=True)
+        else:
+            result = await _answer(text_query, language, mode, audio_bytes, history, audio_mode)
+        content, english_query, english_answer = result
+        rag_service.sessions.record(session_id, english_query, english_answer)
+    return JSONResponse(content=content)
+
+
+def _check_audio_mode(audio_mode: str):
+    if audio_mode not in AUDIO_MODES:
+        raise HTTPException(status_code=400, detail=f"audio_mode must be one of {', '.join(AUDIO_MODES)}.")
+
+
+def _flight_key(text_query: Optional[str], language: str, mode: str, audio_bytes: bytes) -> str:
+    # Audio takes precedence over text in _resolve_query, so it does here too.
+    if audio_bytes:
+        return f"audio:{language}:{mode}:{hashlib.sha256(audio_bytes).hexdigest()}"
+    # Only case and spacing are folded: the raw query may be in any script, and
+    # normalize_query's punctuation stripping also drops Indic vowel signs.
+    text = " ".join(unicodedata.normalize("NFC", text_query or "").casefold().split())
+    return f"text:{language}:{mode}:{text}"
+
+
+async def _answer(
+    text_query: Optional[str], language: str, mode: str, audio_bytes: bytes, history: str, audio_mode: str
+) -> tuple:
+    """
+    The full /v2/chat pipeline; runs once per flight, under one admission slot.
+    Returns the response body plus the English question and answer for the session.
+    """
+    executors.admission.acquire()
+    try:
+        english_query = await _resolve_query(text_query, language, audio_bytes)
+
+        # Retrieval runs before the LLM slot is taken so concurrent questions can share a batch.
+        with telemetry.span("retrieve"):
+            try:
+                prepared = await executors.RETRIEVAL.run(rag_service.prepare_response, english_query, mode, history)
+            except Exception as e:
+                print(f"❌ Error during retrieval: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+        llm_response = prepared
+        if "prompt" in prepared:
+            with telemetry.span("llm"):
+                llm_response = await executors.LLM.run(rag_service.get_response, english_query, mode, history, prepared)
+        if "error" in llm_response:
+            raise HTTPException(status_code=500, detail=llm_response["error"])
+
+        english_answer = llm_response.get("answer", "")
+
+        final_answer = english_answer
+        if language != "en":
+            with telemetry.span("translate_answer"):
+                final_answer = await executors.TRANSLATION.run(translation_service.translate_text, english_answer, language, 'en')
+
+        if audio_mode == "deferred":
+            content = {"text_answer": final_answer, **await _defer_audio(final_answer, language)}
+        else:
+            with telemetry.span("tts", chars=len(final_answer)):
+                audio_response_bytes = await executors.TTS.run(audio_service.text_to_speech, final_answer, language)
+            content = {
+                "text_answer": final_answer,
+                "audio_answer_base64": base64.b64encode(audio_response_bytes).decode('utf-8')
+            }
+    finally:
+        executors.admission.release()
+
+    return content, english_query, english_answer
+
+
+async def _defer_audio(text: str, language: str) -> dict:
+    """Registers the answer for on-demand synthesis; returns the fields the client needs to fetch it."""
+    # defer() writes to the SQLite store; keep that off the event loop.
+    audio_id = await asyncio.to_thread(audio_service.defer, text, language)
+    if config.DEFERRED_AUDIO_PREFETCH:
+        task = asyncio.ensure_future(_synthesize_deferred(audio_id, text, language))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return {"audio_id": audio_id, "audio_url": f"/v2/audio/{audio_id}"}
+
+
+async def _synthesize_deferred(audio_id: str, text: str, language: str) -> bytes:
+    # A prefetch and the client's request (or several range requests) share one synthesis.
+    audio_bytes, _ = await audio_flights.do(
+        audio_id, lambda: executors.TTS.run(audio_service.text_to_speech, text, language)
+    )
+    return audio_bytes
+
+
+async def _transcribe(audio_bytes: bytes, language: str) -> str:
+    if config.WHISPER_BATCHING and not config.MODEL_HOST_SOCKET:
+        # The first call loads Whisper (or waits for warm-up to); keep that off the event loop.
+        batcher = await asyncio.to_thread(audio_service.get_batcher)
+        return await asyncio.wrap_future(batcher.submit(audio_bytes, language))
+    return await executors.WHISPER.run(audio_service.transcribe_audio, audio_bytes, language)
+
+
+async def _resolve_query(text_query: Optional[str], language: str, audio_bytes: bytes) -> str:
+    """Transcribes the audio (if any) and returns the query in English."""
     query_text = text_query
-    
-    if audio_file:
-        audio_bytes = await audio_file.read()
-        if audio_bytes:
-            query_text = audio_service.transcribe_audio(audio_bytes)
+
+    if audio_bytes:
+        with telemetry.span("whisper", audio_bytes=len(audio_bytes)):
+            query_text = await _transcribe(audio_bytes, language)
     
     if not query_text:
         raise HTTPException(status_code=400, detail="No query provided.")
         
     english_query = query_text
     if language != "en":
-        english_query = translation_service.translate_text(query_text, 'en', language)
+        with telemetry.span("translate_query"):
+            english_query = await executors.TRANSLATION.run(translation_service.translate_text, query_text, 'en', language)
+    return english_query
 
-    llm_response = rag_service.get_response(english_query, mode)
-    if "error" in llm_response:
-        raise HTTPException(status_code=500, detail=llm_response["error"])
 
-    english_answer = llm_response.get("answer", "")
-    
-    final_answer = english_answer
+async def _render_sentence(sentence: str, language: str, with_audio: bool = True) -> dict:
+    """Translates one English sentence and synthesizes its audio."""
+    text = sentence
     if language != "en":
-        final_answer = translation_service.translate_text(english_answer, language, 'en')
+        with telemetry.span("translate_sentence"):
+            text = await executors.TRANSLATION.run(translation_service.translate_text, sentence, language, 'en')
+    if not with_audio:
+        return {"text": text}
+    with telemetry.span("tts_sentence", chars=len(text)):
+        audio_bytes = await executors.TTS.run(audio_service.text_to_speech, text, language)
+    return {"text": text, "audio_base64": base64.b64encode(audio_bytes).decode('utf-8')}
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+class _StreamSlot:
+    """A streaming request's admission slot and trace, released exactly once."""
 
-    audio_response_bytes = audio_service.text_to_speech(final_answer, language)
-    audio_response_base64 = base64.b64encode(audio_response_bytes).decode('utf-8')
+    def __init__(self, trace: telemetry.Trace):
+        self.trace = trace
+        self.released = False
+
+    def release(self, error: Optional[str] = None):
+        if self.released:
+            return
+        self.released = True
+        executors.admission.release()
+        telemetry.finish_trace(self.trace, error)
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """
+    Releases the stream's slot when the response ends, however it ends. If the
+    client is gone before the response starts, the body generator never runs
+    and its own cleanup would never fire.
+    """
 
-    return JSONResponse(content={
-        "text_answer": final_answer,
-        "audio_answer_base64": audio_response_base64
-    })
+    def __init__(self, content, slot: _StreamSlot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Run the generator's cleanup now rather than whenever it is garbage collected.
+            await self.body_iterator.aclose()
+            self.slot.release("disconnected")
+
+
+async def _stream_answer(
+    english_query: str, language: str, mode: str, slot: _StreamSlot, session_id: Optional[str], audio_mode: str
+):
+    """
+    Streams the answer as NDJSON events:
+      {"type": "token", "text": ...}      raw English tokens as Ollama emits them
+      {"type": "sentence", "index": n, "text": ..., "audio_base64": ...}
+      {"type": "done", "text_answer": ...} or {"type": "error", "detail": ...}
+    With audio_mode=deferred, sentences carry no audio and "done" carries an
+    audio_id/audio_url for the whole answer instead.
+    Each finished sentence is translated and synthesized on the translation
+    and TTS stages while the LLM keeps generating; sentences are always
+    emitted in order. Releases the caller's admission slot and finishes the
+    request's trace when it ends; a completed answer is added to the session.
+    """
+    # Streaming runs after the endpoint returned; make the trace current again
+    # so the producer thread and the render tasks record into it.
+    trace = slot.trace
+    telemetry.current_trace.set(trace)
+    history = rag_service.sessions.history(session_id)
+    loop = asyncio.get_running_loop()
+    tokens: asyncio.Queue = asyncio.Queue()
+    end_of_stream = object()
+    cancelled = threading.Event()
+
+    def produce(prepared: dict):
+        try:
+            for token in rag_service.stream_response(english_query, mode, history, prepared):
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(tokens.put_nowait, token)
+        except Exception as e:
+            print(f"❌ Error during streaming generation: {e}")
+            loop.call_soon_threadsafe(tokens.put_nowait, e)
+        loop.call_soon_threadsafe(tokens.put_nowait, end_of_stream)
+
+    async def generate():
+        # Retrieval runs before the LLM slot is taken so concurrent questions can share a batch.
+        try:
+            with telemetry.span("retrieve"):
+                prepared = await executors.RETRIEVAL.run(rag_service.prepare_response, english_query, mode, history)
+        except Exception as e:
+            print(f"❌ Error during retrieval: {e}")
+            tokens.put_nowait(e)
+            tokens.put_nowait(end_of_stream)
+            return
+        if cancelled.is_set():
+            tokens.put_nowait(end_of_stream)
+            return
+        await executors.LLM.run(produce, prepared)
+
+    producer = asyncio.ensure_future(generate())
+    splitter = SentenceSplitter()
+    pending = deque()
+    rendered = []
+    english_tokens = []
+    next_token = None
+    generating = True
+    error = None
+    finished = False
+
+    def schedule(sentences):
+        for sentence in sentences:
+            pending.append(asyncio.ensure_future(_render_sentence(sentence, language, audio_mode != "deferred")))
+
+    try:
+        while generating or pending:
+            waiters = set()
+            if generating:
+                if next_token is None:
+                    next_token = asyncio.ensure_future(tokens.get())
+                waiters.add(next_token)
+            if pending:
+                waiters.add(pending[0])
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+
+            while pending and pending[0].done():
+                sentence = pending.popleft().result()
+                rendered.append(sentence["text"])
+                if len(rendered) == 1:
+                    trace.set(first_sentence_s=round(time.perf_counter() - trace.started, 4))
+                yield _ndjson({"type": "sentence", "index": len(rendered) - 1, **sentence})
+
+            if next_token is not None and next_token in done:
+                token = next_token.result()
+                next_token = None
+                if token is end_of_stream:
+                    generating = False
+                    schedule(splitter.flush())
+                elif isinstance(token, Exception):
+                    error = token
+                else:
+                    english_tokens.append(token)
+                    yield _ndjson({"type": "token", "text": token})
+                    schedule(splitter.feed(token))
+
+        await producer
+        finished = True
+        if error is not None:
+            yield _ndjson({"type": "error", "detail": str(error), "text_answer": splitter.join(rendered)})
+        else:
+            rag_service.sessions.record(session_id, english_query, "".join(english_tokens).strip())
+            # Rejoin on the line breaks the splitter cut at, so lists and steps read as in /v2/chat.
+            done = {"type": "done", "text_answer": splitter.join(rendered)}
+            if audio_mode == "deferred" and rendered:
+                done.update(await _defer_audio(done["text_answer"], language))
+            yield _ndjson(done)
+    finally:
+        # The client may disconnect mid-answer; stop generating and drop queued work.
+        cancelled.set()
+        if next_token is not None:
+            next_token.cancel()
+        for task in pending:
+            task.cancel()
+        if error is not None:
+            slot.release(telemetry.error_kind(error))
+        else:
+            slot.release(None if finished else "disconnected")
+
+
+@app.post("/v2/chat/stream")
+async def chat_stream_endpoint(
+    text_query: Optional[str] = Form(None),
+    language: str = Form("en"),
+    mode: str = Form("General Chat"),
+    session_id: Optional[str] = Form(None),
+    audio_mode: str = Form("inline"),
+    audio_file: Optional[UploadFile] = File(None)
+):
+    """
+    Streaming variant of /v2/chat. Returns newline-delimited JSON so the client
+    can show (and play) the first sentence while the rest is still generating.
+    """
+    _check_audio_mode(audio_mode)
+    trace = telemetry.start_trace("chat_stream", _mode_label(mode), language)
+    token = telemetry.current_trace.set(trace)
+    try:
+        executors.admission.acquire()
+        try:
+            audio_bytes = await audio_file.read() if audio_file else b""
+            english_query = await _resolve_query(text_query, language, audio_bytes)
+        except BaseException:
+            executors.admission.release()
+            raise
+    except BaseException as e:
+        telemetry.finish_trace(trace, telemetry.error_kind(e))
+        raise
+    finally:
+        telemetry.current_trace.reset(token)
+    # The admission slot and the trace are closed once the stream ends (see _StreamSlot).
+    slot = _StreamSlot(trace)
+    return _SlotStreamingResponse(
+        _stream_answer(english_query, language, mode, slot, session_id, audio_mode),
+        slot, media_type="application/x-ndjson",
+    )
+
+
+@app.get("/v2/audio/{audio_id}")
+async def audio_endpoint(audio_id: str, request: Request):
+    """
+    Serves the MP3 for an answer requested with audio_mode=deferred,
+    synthesizing it on first use. Supports single byte ranges and ETags.
+    """
+    pending = await asyncio.to_thread(audio_service.deferred_text, audio_id)
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired audio ID.")
+    text, language = pending
+    etag = f'"{audio_id}"'
+    headers = {"ETag": etag, "Cache-Control": AUDIO_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in if_none_match or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    with telemetry.request_trace("audio", "none", language):
+        audio_bytes = await _synthesize_deferred(audio_id, text, language)
+        if not audio_bytes:
+            # Usually a transient TTS failure: nothing here may be cached.
+            raise HTTPException(
+                status_code=503, detail="Speech synthesis failed; try again shortly.",
+                headers={"Retry-After": str(config.RETRY_AFTER_MIN_SECONDS)},
+            )
+
+    size = len(audio_bytes)
+    byte_range = _parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        return Response(content=audio_bytes, media_type="audio/mpeg", headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(content=audio_bytes[start:end + 1], status_code=206, media_type="audio/mpeg", headers=headers)
+
+
+def _parse_range(header: Optional[str], size: int):
+    """
+    (start, end) for a single "bytes=" range, None to send the whole body
+    (no header, or several ranges, which we don't split). Raises 416 if unsatisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1  # suffix range: the last N bytes
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable.", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
 
 
 @app.get("/find_aid_centers")
-def find_aid_centers(city: str):
-    """Endpoint to find legal aid centers by city."""
+def find_aid_centers(
+    city: Optional[str] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    limit: int = 5
+):
+    """
+    Endpoint to find legal aid centers by city, or the nearest ones to a
+    latitude/longitude (results then include distance_km).
+    """
+    if lat is not None and lon is not None:
+        centers = location_service.find_nearest_centers(lat, lon, limit)
+        if not centers:
+            return {"message": "No legal aid centers with known locations were found."}
+        return centers
+    if not city:
+        raise HTTPException(status_code=400, detail="Provide a city, or lat and lon.")
     centers = location_service.find_centers(city)
     if not centers:
         return {"message": f"No legal aid centers found for {city}."}
     return centers
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss statistics for the server-side caches."""
+    return {
+        "answers": rag_service.cache_stats(),
+        "translations": translation_service.cache_stats(),
+        "audio": audio_service.cache_stats(),
+        "query_embeddings": rag_service.embedding_cache_stats()
+    }
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: latency histograms, in-flight gauges and error counters."""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    body, content_type = telemetry.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/ready")
+def readiness_check():
+    """
+    Reports whether every model the chat path needs is loaded. Returns 503
+    until warm-up finishes so load balancers only route chat traffic here
+    once it's warm.
+    """
+    components = _ready_components()
+    ready = registry.is_ready(components)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "components": registry.status(components)}
+    )
+
 @app.get("/health")
 def health_check():
     """A simple endpoint to confirm the server is running."""
-    return {"status": "ok", "version": "2.0.0"}
\ No newline at end of file
+    return {
+        "status": "ok",
+        "version": "2.0.0",
+        "load": executors.admission.stats(),
+        "coalescing": chat_flights.stats(),
+        "conversations": rag_service.sessions.stats(),
+        "retrieval_batching": rag_service.retrieval_batch_stats()
+    }
\ No newline at end of file
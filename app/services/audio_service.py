@@ -1,51 +1,346 @@
 # app/services/audio_service.py
 import whisper
+import torch
 import io
+import hashlib
+import threading
+from concurrent.futures import Future
+import numpy as np
 from gtts import gTTS
 from pydub import AudioSegment
-import tempfile
 import os
 
-# Load the base model, it's small, fast, and multilingual
-print("🧠 Audio Service: Loading Whisper model...")
-try:
-    whisper_model = whisper.load_model("base")
-    print("✅ Audio Service: Whisper model loaded.")
-except Exception as e:
-    print(f"❌ Audio Service: Failed to load Whisper model. Error: {e}")
-    # You might want to handle this more gracefully, but for now, we let it raise
-    raise
-
-def transcribe_audio(audio_bytes: bytes) -> str:
-    """Transcribes audio bytes to text using Whisper."""
+from ..core import config
+from ..core.batching import MicroBatcher
+from ..core.cache import CacheStats, LRUCache, SqliteStore
+from ..core.registry import registry
+from ..core.text_utils import split_sentences
+
+# The base model is small, fast, and multilingual. It is loaded on first use
+# (or during warm-up) through the registry rather than at import time.
+WHISPER_MODEL = "base"
+
+def _load_whisper():
+    if config.MODEL_HOST_SOCKET:
+        from .model_host import RemoteWhisper, get_client
+        print(f"🧠 Audio Service: Using Whisper from the model host at {config.MODEL_HOST_SOCKET}...")
+        return RemoteWhisper(get_client())
+    print("🧠 Audio Service: Loading Whisper model...")
+    return whisper.load_model(WHISPER_MODEL)
+
+registry.register("whisper", _load_whisper)
+
+def get_whisper_model():
+    return registry.get("whisper")
+
+def decode_audio(audio_bytes: bytes) -> np.ndarray:
+    """
+    Decodes webm/ogg/wav bytes from the frontend straight to the 16 kHz mono
+    float32 array Whisper expects, without a temporary file.
+    """
+    audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
+    audio = audio.set_channels(1).set_frame_rate(whisper.audio.SAMPLE_RATE).set_sample_width(2)
+    return np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _language_hint(language: str = None):
+    # Only pass codes Whisper knows; None lets it auto-detect.
+    return language if language in whisper.tokenizer.LANGUAGES else None
+
+
+def transcribe_audio(audio_bytes: bytes, language: str = None) -> str:
+    """
+    Transcribes audio bytes to text using Whisper. The client's language
+    code is used as a decoding hint so language detection is skipped.
+    """
     try:
-        # Convert webm/ogg bytes from frontend to a format whisper can handle
-        audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        
-        # Whisper works best with WAV format
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            audio.export(tmp.name, format="wav")
-            tmp_path = tmp.name
-        
-        # Transcribe the temporary file
-        result = whisper_model.transcribe(tmp_path, fp16=False) # fp16=False for CPU
-        os.remove(tmp_path) # Clean up the temp file
-        
+        samples = decode_audio(audio_bytes)
+        result = get_whisper_model().transcribe(samples, language=_language_hint(language), fp16=False) # fp16=False for CPU
         return result["text"]
     except Exception as e:
         print(f"Error during audio transcription: {e}")
         return ""
 
-def text_to_speech(text: str, lang: str) -> bytes:
-    """Converts text to speech audio bytes using gTTS."""
-    if not text:
-        return b""
-    try:
+
+class TranscriptionBatcher(MicroBatcher):
+    """
+    Runs the concurrent audio requests that fit in Whisper's 30 s context
+    through a single batched decode (grouped by language hint). Longer clips
+    fall back to transcribe().
+    """
+
+    def __init__(self, model, max_batch: int, window_ms: int):
+        self.model = model
+        super().__init__("whisper", max_batch, window_ms)
+
+    def submit(self, audio_bytes: bytes, language: str = None) -> Future:
+        return super().submit((audio_bytes, _language_hint(language)))
+
+    def submit_samples(self, samples: np.ndarray, language: str = None) -> Future:
+        """Like submit, for audio that is already decoded to 16 kHz float32."""
+        return super().submit((samples, _language_hint(language)))
+
+    def process(self, batch):
+        by_language = {}
+        for (audio, language), future in batch:
+            try:
+                samples = audio if isinstance(audio, np.ndarray) else decode_audio(audio)
+            except Exception as e:
+                print(f"Error during audio decoding: {e}")
+                future.set_result("")
+                continue
+            if len(samples) > whisper.audio.N_SAMPLES:
+                self._transcribe_one(samples, language, future)
+            else:
+                by_language.setdefault(language, []).append((samples, future))
+        for language, items in by_language.items():
+            self._decode_batch(language, items)
+
+    def _transcribe_one(self, samples, language, future):
+        try:
+            result = self.model.transcribe(samples, language=language, fp16=False)
+            future.set_result(result["text"])
+        except Exception as e:
+            print(f"Error during audio transcription: {e}")
+            future.set_result("")
+
+    def _decode_batch(self, language, items):
+        try:
+            mels = [
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), n_mels=self.model.dims.n_mels)
+                for samples, _ in items
+            ]
+            options = whisper.DecodingOptions(language=language, fp16=False)
+            results = whisper.decode(self.model, torch.stack(mels).to(self.model.device), options)
+            for (_, future), result in zip(items, results):
+                future.set_result(result.text)
+        except Exception as e:
+            print(f"Error during batched transcription: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_result("")
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> TranscriptionBatcher:
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = TranscriptionBatcher(get_whisper_model(), config.WHISPER_MAX_BATCH, config.WHISPER_BATCH_WINDOW_MS)
+        return _batcher
+
+
+# --- TEXT-TO-SPEECH BACKENDS ---
+
+class GTTSBackend:
+    name = "gtts"
+
+    def synthesize(self, text: str, lang: str) -> bytes:
         tts = gTTS(text=text, lang=lang, slow=False)
         fp = io.BytesIO()
         tts.write_to_fp(fp)
         fp.seek(0)
         return fp.read()
+
+
+class SilentBackend:
+    """Offline stand-in that produces no audio."""
+
+    name = "silent"
+
+    def synthesize(self, text: str, lang: str) -> bytes:
+        return b""
+
+
+BACKENDS = {backend.name: backend for backend in (GTTSBackend, SilentBackend)}
+
+tts_backend = BACKENDS[config.TTS_BACKEND]()
+
+
+def set_tts_backend(new_backend):
+    """Swaps the TTS backend, e.g. for an offline stand-in. Clears the memory tier."""
+    global tts_backend
+    tts_backend = new_backend
+    audio_cache.memory.clear()
+
+
+# --- AUDIO CACHE ---
+
+def audio_key(text: str, lang: str) -> str:
+    """Content address of one synthesized sentence."""
+    return hashlib.sha256(f"{tts_backend.name}\n{lang}\n{text}".encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    MP3 clips keyed by (language, text hash): a hot in-memory LRU in front of
+    a size-bounded directory on disk. When the directory grows past max_bytes
+    the least recently used files are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, memory_entries: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory = LRUCache(memory_entries)
+        self.disk_stats = CacheStats()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._files())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key: str):
+        audio = self.memory.get(key)
+        if audio is not None or not self.directory:
+            return audio
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)  # mtime doubles as last-access time for eviction
+        except FileNotFoundError:
+            self.disk_stats.misses += 1
+            return None
+        self.disk_stats.hits += 1
+        self.memory.set(key, audio)
+        return audio
+
+    def set(self, key: str, audio: bytes):
+        self.memory.set(key, audio)
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_bytes += len(audio)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Trim to 90% so we don't walk the directory on every write.
+        files = sorted(self._files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.disk_stats.evictions += 1
+            except FileNotFoundError:
+                pass
+        self._disk_bytes = total
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats.as_dict(),
+            "disk": self.disk_stats.as_dict(),
+            "disk_bytes": self._disk_bytes,
+        }
+
+
+audio_cache = AudioCache(config.TTS_CACHE_DIR, config.TTS_CACHE_MAX_BYTES, config.TTS_CACHE_MEMORY_ENTRIES)
+
+
+def synthesize_sentence(sentence: str, lang: str) -> bytes:
+    """Returns the MP3 for one sentence, from the cache when possible."""
+    key = audio_key(sentence, lang)
+    audio = audio_cache.get(key)
+    if audio is None:
+        audio = tts_backend.synthesize(sentence, lang)
+        if audio:
+            audio_cache.set(key, audio)
+    return audio
+
+
+def text_to_speech(text: str, lang: str) -> bytes:
+    """
+    Converts text to speech audio bytes. Each sentence is synthesized and
+    cached separately, so answers that share sentences reuse their audio;
+    MP3 frames can simply be concatenated.
+    """
+    if not text:
+        return b""
+    try:
+        return b"".join(synthesize_sentence(sentence, lang) for sentence in split_sentences(text))
     except Exception as e:
         print(f"Error during text-to-speech: {e}")
-        return b""
\ No newline at end of file
+        return b""
+
+
+# --- DEFERRED AUDIO ---
+# Answers whose audio will be synthesized when first requested, by audio ID.
+# The ID is the answer's content address, so the same answer always gets the same ID.
+_deferred = LRUCache(config.DEFERRED_AUDIO_MAX_ENTRIES, config.DEFERRED_AUDIO_TTL_SECONDS)
+_deferred_store = SqliteStore(config.DEFERRED_AUDIO_PATH, table="deferred_audio") if config.DEFERRED_AUDIO_PATH else None
+
+
+def defer(text: str, lang: str) -> str:
+    """Registers text for on-demand synthesis and returns its audio ID."""
+    audio_id = audio_key(text, lang)
+    _deferred.set(audio_id, [text, lang])
+    if _deferred_store:
+        _deferred_store.set(audio_id, [text, lang])
+    return audio_id
+
+
+def deferred_text(audio_id: str):
+    """(text, lang) for an ID returned by defer(), or None if it is unknown or expired."""
+    item = _deferred.get(audio_id)
+    if item is None and _deferred_store:
+        item = _deferred_store.get(audio_id, config.DEFERRED_AUDIO_TTL_SECONDS)
+        if item is not None:
+            _deferred.set(audio_id, item)
+    return tuple(item) if item else None
+
+
+# --- PRE-WARMING ---
+
+# Fixed phrases the bot says verbatim: the RAG fallback from rag_service's
+# prompt and the greetings from its few-shot examples.
+PREWARM_PHRASES = [
+    "I cannot find the answer to that question in the provided document.",
+    "Hello! What can I do for you today?",
+    "Good morning to you too! How can I help?",
+]
+
+
+def prewarm(languages: list[str] = None):
+    """Synthesizes PREWARM_PHRASES in every supported language."""
+    from . import translation_service
+
+    languages = languages or config.SUPPORTED_LANGUAGES
+    print(f"🔥 Audio Service: Pre-warming TTS cache for {len(languages)} languages...")
+    for lang in languages:
+        for phrase in PREWARM_PHRASES:
+            try:
+                text = phrase if lang == "en" else translation_service.translate_text(phrase, lang, 'en')
+                text_to_speech(text, lang)
+            except Exception as e:
+                print(f"⚠️ Audio Service: Could not pre-warm '{phrase}' in '{lang}': {e}")
+    print("✅ Audio Service: TTS cache pre-warmed.")
+
+
+def cache_stats() -> dict:
+    return {"backend": tts_backend.name, **audio_cache.stats()}
@@ -0,0 +1,240 @@
+# app/services/compact_index.py
+"""
+A read-only vector store for small corpora: chunk embeddings in one
+contiguous float16 (or int8) matrix, plus the chunk texts and metadata in an
+offset-indexed file. Both are memory-mapped, so opening the index costs a few
+file opens and pages are shared by every process that serves it. A search is
+an exact top-k over one matrix product per block of rows.
+
+scripts/ingest_data_ocr.py writes it next to the Chroma store; select it
+with VECTOR_STORE_BACKEND=compact.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Written inside the vector store directory.
+COMPACT_INDEX_DIRNAME = "compact_index"
+DTYPES = ("float16", "int8")
+# Rows scored per matrix product; bounds the float32 copy made of each block.
+BLOCK_ROWS = 65536
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.npy"        # (n, dim) float16, or int8 with per-row scales
+SCALES_FILE = "scales.npy"          # (n,) float32, int8 only
+SQ_NORMS_FILE = "sq_norms.npy"      # (n,) float32 squared norms of the stored vectors
+RECORDS_FILE = "records.jsonl"      # one JSON [id, text, metadata] per row
+OFFSETS_FILE = "offsets.npy"        # (n + 1,) int64 byte offsets into RECORDS_FILE
+
+
+def _quantize(vectors: np.ndarray, dtype: str):
+    """Returns (stored matrix, per-row scales or None, squared norms of what is stored)."""
+    if dtype == "float16":
+        stored = vectors.astype(np.float16)
+        restored, scales = stored.astype(np.float32), None
+    else:
+        # Symmetric per-row scaling keeps every row's full int8 range.
+        scales = np.abs(vectors).max(axis=1, initial=0.0) / 127.0
+        scales[scales == 0] = 1.0
+        stored = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        restored = stored.astype(np.float32) * scales[:, None]
+        scales = scales.astype(np.float32)
+    return stored, scales, np.einsum("ij,ij->i", restored, restored).astype(np.float32)
+
+
+def write_index(
+    path: str, ids: list[str], texts: list[str], metadatas: list[dict], embeddings,
+    dtype: str = "float16", version: str = "",
+):
+    """
+    Writes the index to `path`, replacing any existing one. The new files are
+    written to a sibling directory first, so a reader never opens a mix.
+    `version` is the vector store version this build belongs to.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Compact index dtype must be one of {', '.join(DTYPES)}, not '{dtype}'.")
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2:  # an empty corpus
+        vectors = vectors.reshape(len(texts), -1 if len(texts) else 0)
+    stored, scales, sq_norms = _quantize(vectors, dtype)
+
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, VECTORS_FILE), stored)
+    np.save(os.path.join(tmp_path, SQ_NORMS_FILE), sq_norms)
+    if scales is not None:
+        np.save(os.path.join(tmp_path, SCALES_FILE), scales)
+    offsets = [0]
+    with open(os.path.join(tmp_path, RECORDS_FILE), "wb") as f:
+        for row in zip(ids, texts, metadatas):
+            offsets.append(offsets[-1] + f.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n"))
+    np.save(os.path.join(tmp_path, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "count": len(texts), "dim": vectors.shape[1], "dtype": dtype, "metric": "l2", "version": version,
+        }, f)
+
+    # Processes that already mapped the old files keep reading them until they reopen.
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class CompactIndex:
+    """One build of the index on disk, memory-mapped read-only."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        self.sq_norms = np.load(os.path.join(path, SQ_NORMS_FILE), mmap_mode="r")
+        self.scales = (
+            np.load(os.path.join(path, SCALES_FILE), mmap_mode="r") if self.meta["dtype"] == "int8" else None
+        )
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        # np.memmap refuses zero-length files.
+        records_path = os.path.join(path, RECORDS_FILE)
+        self.records = np.memmap(records_path, dtype=np.uint8, mode="r") if os.path.getsize(records_path) else b""
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def top_k(self, vectors, k: int) -> list[list[tuple[int, float]]]:
+        """Exact top-k (row, squared L2 distance) for each query vector."""
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries = queries.reshape(-1, queries.shape[-1])
+        count = len(self)
+        k = min(k, count)
+        if k <= 0:
+            return [[] for _ in queries]
+        if queries.shape[1] != self.meta["dim"]:
+            raise ValueError(
+                f"Query embeddings have {queries.shape[1]} dimensions but the compact index has "
+                f"{self.meta['dim']}; re-run ingestion with --rebuild after changing EMBEDDING_MODEL."
+            )
+        # |q - x|^2 = |q|^2 - (2 q.x - |x|^2); rank by the bracket, largest first.
+        scores = np.empty((count, len(queries)), dtype=np.float32)
+        for start in range(0, count, BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            products = block @ queries.T
+            if self.scales is not None:
+                products *= self.scales[start:start + BLOCK_ROWS, None]
+            scores[start:start + len(block)] = 2 * products - self.sq_norms[start:start + BLOCK_ROWS, None]
+        if k < count:
+            candidates = np.argpartition(-scores, k - 1, axis=0)[:k]
+        else:
+            candidates = np.broadcast_to(np.arange(count)[:, None], scores.shape)
+        query_sq_norms = np.einsum("ij,ij->i", queries, queries)
+        results = []
+        for column, rows in enumerate(candidates.T):
+            column_scores = scores[rows, column]
+            order = np.argsort(-column_scores, kind="stable")
+            results.append([
+                (int(rows[i]), max(0.0, float(query_sq_norms[column] - column_scores[i]))) for i in order
+            ])
+        return results
+
+    def document(self, row: int) -> Document:
+        _, text, metadata = json.loads(bytes(self.records[self.offsets[row]:self.offsets[row + 1]]))
+        return Document(page_content=text, metadata=metadata or {})
+
+
+def _build_id(path: str):
+    # write_index swaps in a new directory, so a new build means a new meta.json inode.
+    stat = os.stat(os.path.join(path, META_FILE))
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class CompactVectorStore(VectorStore):
+    """
+    Serves the index written by write_index(). Distances are squared L2, the
+    same metric (and so the same ranking) as the default Chroma collection.
+    When ingestion writes a new build, the store switches to it within
+    RELOAD_CHECK_INTERVAL seconds, like the lexical index does.
+    """
+
+    RELOAD_CHECK_INTERVAL = 5.0
+
+    def __init__(self, path: str, embedding: Embeddings):
+        self.path = path
+        self.embedding = embedding
+        self._build = _build_id(path)
+        self._index = CompactIndex(path)
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def current(self) -> CompactIndex:
+        """The mapped build, reopening the index if ingestion has replaced it."""
+        now = time.monotonic()
+        if now - self._checked_at < self.RELOAD_CHECK_INTERVAL:
+            return self._index
+        with self._lock:
+            if now - self._checked_at >= self.RELOAD_CHECK_INTERVAL:
+                self._checked_at = now
+                try:
+                    build = _build_id(self.path)
+                    if build != self._build:
+                        # Searches already running keep the old mapping until they finish.
+                        self._index, self._build = CompactIndex(self.path), build
+                        print(f"♻️ Compact index: Reloaded {len(self._index)} chunks from {self.path}.")
+                except (OSError, ValueError) as e:
+                    # Most likely caught mid-swap; keep serving the old build and retry later.
+                    print(f"⚠️ Compact index: Reload failed, keeping previous build. Error: {e}")
+            return self._index
+
+    def __len__(self) -> int:
+        return len(self.current())
+
+    @property
+    def version(self) -> str:
+        """The vector store version of the build being served ("" if it wasn't recorded)."""
+        return self.current().meta.get("version", "")
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    # --- SEARCH ---
+
+    def similarity_search_by_vector_with_score(self, embedding: list[float], k: int = 4) -> list[tuple[Document, float]]:
+        index = self.current()
+        return [(index.document(row), distance) for row, distance in index.top_k(embedding, k)[0]]
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k)
+
+    def search_many(self, vectors: list[list[float]], k: int) -> list[list[Document]]:
+        """Top-k for several query vectors with one matrix product."""
+        if not vectors:
+            return []
+        index = self.current()
+        return [[index.document(row) for row, _ in hits] for hits in index.top_k(vectors, k)]
+
+    # --- READ-ONLY ---
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("The compact index is read-only; run scripts/ingest_data_ocr.py.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Build the compact index with write_index() or scripts/ingest_data_ocr.py.")
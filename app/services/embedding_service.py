@@ -0,0 +1,117 @@
+# app/services/embedding_service.py
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..core import config
+from ..core.cache import LRUCache
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Runs a sentence-transformers model (CLS pooling + L2 normalisation, as
+    bge-small uses) through ONNX Runtime with int8 dynamically quantized
+    weights. The model is exported and quantized once, on first use.
+    """
+
+    def __init__(self, model_name: str, model_dir: str, batch_size: int = 64):
+        from onnxruntime import InferenceSession, SessionOptions
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model_dir = os.path.join(model_dir, model_name.replace("/", "__"))
+        quantized_path = os.path.join(self.model_dir, "model_int8.onnx")
+        if not os.path.exists(quantized_path):
+            self._export_and_quantize(quantized_path)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        options = SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        self.session = InferenceSession(quantized_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _export_and_quantize(self, quantized_path: str):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        print(f"🧠 Embedding Service: Exporting {self.model_name} to ONNX (one-time)...")
+        fp32_dir = os.path.join(self.model_dir, "fp32")
+        ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True).save_pretrained(fp32_dir)
+        AutoTokenizer.from_pretrained(self.model_name).save_pretrained(self.model_dir)
+        quantize_dynamic(os.path.join(fp32_dir, "model.onnx"), quantized_path, weight_type=QuantType.QInt8)
+        print(f"✅ Embedding Service: Quantized model written to {quantized_path}")
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + self.batch_size], padding=True, truncation=True, max_length=512, return_tensors="np"
+            )
+            feed = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, feed)[0]
+            cls = hidden[:, 0]
+            batches.append(cls / np.linalg.norm(cls, axis=1, keepdims=True))
+        return np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text])[0].tolist()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wraps an embedding backend with an LRU cache of query embeddings."""
+
+    def __init__(self, inner: Embeddings, max_entries: int):
+        self.inner = inner
+        self.cache = LRUCache(max_entries)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.set(text, vector)
+        return vector
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        embed_query for many texts: cached vectors are reused and the rest go
+        through one batched call. The models used here embed queries and
+        documents the same way, so embed_documents gives query vectors.
+        """
+        vectors = [self.cache.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, self.inner.embed_documents([texts[i] for i in missing])):
+                vectors[i] = vector
+                self.cache.set(texts[i], vector)
+        return vectors
+
+    def stats(self) -> dict:
+        return {"backend": config.EMBEDDING_BACKEND, "entries": len(self.cache), **self.cache.stats.as_dict()}
+
+
+def create_embeddings(backend: str = None) -> Embeddings:
+    """
+    Builds the configured embedding backend. This is the single place the
+    API and the ingestion script get their embeddings from, so both always
+    use the same model.
+    """
+    backend = backend or config.EMBEDDING_BACKEND
+    print(f"🧠 Embedding Service: Loading {config.EMBEDDING_MODEL} ({backend} backend)...")
+    if backend == "onnx":
+        return OnnxEmbeddings(config.EMBEDDING_MODEL, config.EMBEDDING_ONNX_DIR, config.EMBEDDING_BATCH_SIZE)
+    if backend == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=config.EMBEDDING_MODEL, encode_kwargs={"batch_size": config.EMBEDDING_BATCH_SIZE}
+        )
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
@@ -0,0 +1,172 @@
+# app/services/lexical_index.py
+import json
+import math
+import os
+import re
+from collections import Counter
+
+# Written next to the Chroma files by scripts/ingest_data_ocr.py.
+LEXICAL_INDEX_FILENAME = "lexical_index.json"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it of on or the to what when where which who "
+    "will with can do does my me under shall any such this that".split()
+)
+
+# A section heading in the body of an Act: "6. Request for obtaining information.—(1) A person..."
+# The dash after the marginal title tells it apart from the arrangement of sections.
+SECTION_HEADING = re.compile(r"^\s*(\d{1,3}[A-Z]?)\.\s+[A-Z][^\n]{0,200}?\.\s*[—–-]", re.MULTILINE)
+# A sub-section marker at the start of a line or right after a heading's dash, e.g. "(2)"
+SUBSECTION_MARKER = re.compile(r"(?:^|[—–-])\s*\((\d{1,2})\)\s", re.MULTILINE)
+# Schedules restart their own numbering, so they end the last section.
+SCHEDULE_HEADING = re.compile(r"^\s*THE\s+\w+\s+SCHED", re.MULTILINE)
+# Explicit references in user questions: "Section 6(1)", "sec. 8", "s. 7", "s 7 (3)".
+# A bare "s" must not follow an apostrophe, so "it's 30 days" is not section 30.
+SECTION_REFERENCE = re.compile(
+    r"(?<!['’])\b(?:section|sec\.?|s\.|s(?=\s))\s*(\d{1,3}[a-z]?)\s*(?:\(\s*(\d{1,2})\s*\))?", re.IGNORECASE
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def parse_section_reference(query: str):
+    """Returns (section, subsection or None) for the first explicit reference, else None."""
+    match = SECTION_REFERENCE.search(query)
+    if not match:
+        return None
+    return match.group(1).upper(), match.group(2)
+
+
+class LexicalIndex:
+    """
+    A BM25 index over the same chunks as the vector store, plus a section
+    index mapping each document's "6" and "6(1)" to the chunks that contain
+    them (every Act numbers its sections from 1). Both are built at
+    ingestion time and loaded read-only by the API.
+    """
+
+    def __init__(self, ids, texts, metadatas, postings, doc_lengths, sections, k1=1.5, b=0.75):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = postings          # term -> [[doc, term frequency], ...]
+        self.doc_lengths = doc_lengths
+        self.sections = sections          # source -> {"6" / "6(1)" -> [doc, ...] in document order}
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, ids: list[str], texts: list[str], metadatas: list[dict]) -> "LexicalIndex":
+        """Builds the index. Chunks must be given in document order for section tracking."""
+        postings = {}
+        doc_lengths = []
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append([doc, tf])
+        return cls(ids, texts, metadatas, postings, doc_lengths, cls._build_sections(texts, metadatas))
+
+    @staticmethod
+    def _build_sections(texts: list[str], metadatas: list[dict]) -> dict:
+        sections = {}
+        current_section, current_source = None, None
+
+        def add(key, doc):
+            docs = sections.setdefault(current_source or "", {}).setdefault(key, [])
+            if not docs or docs[-1] != doc:
+                docs.append(doc)
+
+        for doc, text in enumerate(texts):
+            source = metadatas[doc].get("source")
+            if source != current_source:
+                current_section, current_source = None, source
+            headings = list(SECTION_HEADING.finditer(text))
+            # A chunk that starts mid-section still belongs to the section carried
+            # over, including any sub-sections before its first heading.
+            if current_section:
+                add(current_section, doc)
+                carried_end = headings[0].start() if headings else len(text)
+                for marker in SUBSECTION_MARKER.finditer(text, 0, carried_end):
+                    add(f"{current_section}({marker.group(1)})", doc)
+            for i, heading in enumerate(headings):
+                current_section = heading.group(1)
+                add(current_section, doc)
+                end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+                for marker in SUBSECTION_MARKER.finditer(text, heading.start(), end):
+                    add(f"{current_section}({marker.group(1)})", doc)
+            if SCHEDULE_HEADING.search(text):
+                current_section = None
+        return sections
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """Returns the top-k (doc, BM25 score) pairs."""
+        return self._scores(query).most_common(k)
+
+    def _scores(self, query: str, docs=None) -> Counter:
+        """BM25 scores of the docs matching the query, optionally only among `docs`."""
+        scores = Counter()
+        if not self.doc_lengths:
+            return scores
+        n_docs = len(self.doc_lengths)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                if docs is not None and doc not in docs:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / self.avg_length)
+                scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def lookup_section(self, query: str) -> list[int]:
+        """
+        Chunks for an explicit "Section N(M)" reference in the query, in
+        document order. When several documents have that section, the one
+        whose chunks best match the rest of the query (BM25 over those chunks
+        only) comes first, then the others; ties keep source order.
+        """
+        reference = parse_section_reference(query)
+        if not reference:
+            return []
+        section, subsection = reference
+        per_source = []
+        for source in sorted(self.sections):
+            keys = self.sections[source]
+            if subsection and f"{section}({subsection})" in keys:
+                per_source.append(keys[f"{section}({subsection})"])
+            elif section in keys:
+                per_source.append(keys[section])
+        if len(per_source) > 1:
+            scores = self._scores(query, {doc for docs in per_source for doc in docs})
+            per_source.sort(key=lambda docs: max(scores[doc] for doc in docs), reverse=True)
+        return [doc for docs in per_source for doc in docs]
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+                "sections": self.sections,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        sections = data["sections"]
+        if any(isinstance(docs, list) for docs in sections.values()):
+            # Written before sections were keyed by source; run ingestion to rebuild.
+            sections = {"": sections}
+        return cls(data["ids"], data["texts"], data["metadatas"], data["postings"], data["doc_lengths"], sections)
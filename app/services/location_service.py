@@ -1,6 +1,15 @@
 # app/services/location_service.py
 import pandas as pd
+import numpy as np
 import os
+import re
+import threading
+import time
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is optional; nearest-centre queries fall back to a vectorised scan
+    cKDTree = None
 
 # --- CORRECTED PATH LOGIC ---
 # Get the directory of the currently running script (.../app/services)
@@ -10,21 +19,225 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(SERVICES_DIR))
 # Now, correctly build the path to the data directory from the root
 DATA_PATH = os.path.join(PROJECT_ROOT, "data", "legal_aid_centers.csv")
 
-try:
-    df = pd.read_csv(DATA_PATH)
-    print(f"✅ Location Service: Successfully loaded data from {DATA_PATH}")
-except FileNotFoundError:
-    print(f"❌ Location Service: FATAL ERROR - Cannot find data file at the corrected path: {DATA_PATH}")
-    # Create an empty dataframe to prevent the app from crashing completely
-    df = pd.DataFrame(columns=['city', 'state', 'center_name', 'address', 'phone'])
+COLUMNS = ['name', 'address', 'city', 'state', 'phone_number']
+# How often (seconds) to check the CSV for changes.
+RELOAD_CHECK_INTERVAL = 2.0
+# Minimum trigram similarity for a typo'd city to match.
+FUZZY_THRESHOLD = 0.45
+# Short names share too few trigrams for a swapped or dropped letter to pass
+# the threshold ("dehli" vs "delhi" scores 0.2), so below it, candidates
+# within this many edits (transpositions count as one) still match. Names of
+# up to SHORT_NAME_LENGTH letters get one edit.
+MAX_EDIT_DISTANCE = 2
+SHORT_NAME_LENGTH = 4
+EARTH_RADIUS_KM = 6371.0
+
+# Old and new names, and common spellings, mapped to one canonical key.
+CITY_ALIASES = {
+    "bengaluru": "bangalore",
+    "new delhi": "delhi",
+    "bombay": "mumbai",
+    "madras": "chennai",
+    "calcutta": "kolkata",
+    "mysuru": "mysore",
+    "mangaluru": "mangalore",
+    "belgaum": "belagavi",
+    "hubli": "hubballi",
+    "gurgaon": "gurugram",
+    "trivandrum": "thiruvananthapuram",
+    "cochin": "kochi",
+    "ernakulam": "kochi",
+    "poona": "pune",
+    "baroda": "vadodara",
+    "benares": "varanasi",
+    "banaras": "varanasi",
+    "allahabad": "prayagraj",
+    "pondicherry": "puducherry",
+    "vizag": "visakhapatnam",
+    "calicut": "kozhikode",
+    "trichy": "tiruchirappalli",
+    "tiruchirapalli": "tiruchirappalli",
+}
+
+
+def normalize_city(city: str) -> str:
+    """Lowercases, strips punctuation and applies CITY_ALIASES."""
+    key = " ".join(re.sub(r"[^a-z\s]", " ", str(city).lower()).split())
+    return CITY_ALIASES.get(key, key)
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Damerau-Levenshtein distance (optimal string alignment): adjacent swaps count as one edit."""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _unit_vectors(lat, lon) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class CenterIndex:
+    """
+    An immutable lookup structure over the centres CSV:
+      - a hash index from canonical city name to rows
+      - a trigram index over city names for typo-tolerant matching
+      - when the CSV has latitude/longitude columns, a KD-tree (or a plain
+        array without scipy) for nearest-centre queries
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.astype(object).where(df.notna(), None)  # NaN isn't valid JSON
+        self.records = df.to_dict(orient='records')
+        self.by_city: dict[str, list[int]] = {}
+        for row, record in enumerate(self.records):
+            if record.get('city'):
+                self.by_city.setdefault(normalize_city(record['city']), []).append(row)
+
+        self.by_trigram: dict[str, set[str]] = {}
+        self.city_trigrams = {city: trigrams(city) for city in self.by_city}
+        for city, grams in self.city_trigrams.items():
+            for gram in grams:
+                self.by_trigram.setdefault(gram, set()).add(city)
+
+        self.geo_rows = np.zeros(0, dtype=int)
+        self.points = None
+        self.tree = None
+        if {'latitude', 'longitude'} <= set(df.columns):
+            coords = pd.DataFrame({
+                'lat': pd.to_numeric(df['latitude'], errors='coerce'),
+                'lon': pd.to_numeric(df['longitude'], errors='coerce'),
+            })
+            valid = coords.dropna()
+            if not valid.empty:
+                self.geo_rows = valid.index.to_numpy()
+                self.points = _unit_vectors(valid['lat'].to_numpy(), valid['lon'].to_numpy())
+                self.tree = cKDTree(self.points) if cKDTree is not None else None
+
+    def _rows(self, rows: list[int]) -> list[dict]:
+        return [dict(self.records[row]) for row in rows]
+
+    def find_by_city(self, city: str) -> list[dict]:
+        key = normalize_city(city)
+        if key in self.by_city:
+            return self._rows(self.by_city[key])
+        return self._rows(self._fuzzy_rows(key))
+
+    def _fuzzy_rows(self, key: str) -> list[int]:
+        query = trigrams(key)
+        candidates = set()
+        for gram in query:
+            candidates |= self.by_trigram.get(gram, set())
+        best_score, best_cities = 0.0, []
+        for city in candidates:
+            grams = self.city_trigrams[city]
+            score = len(query & grams) / len(query | grams)
+            if score > best_score:
+                best_score, best_cities = score, [city]
+            elif score == best_score:
+                best_cities.append(city)
+        if best_score < FUZZY_THRESHOLD:
+            best_cities = self._closest_by_edits(key, candidates)
+        return [row for city in sorted(best_cities) for row in self.by_city[city]]
+
+    @staticmethod
+    def _closest_by_edits(key: str, candidates: set[str]) -> list[str]:
+        allowed = 1 if len(key) <= SHORT_NAME_LENGTH else MAX_EDIT_DISTANCE
+        best_distance, best_cities = allowed + 1, []
+        for city in candidates:
+            if abs(len(city) - len(key)) > allowed:
+                continue
+            distance = edit_distance(key, city)
+            if distance < best_distance:
+                best_distance, best_cities = distance, [city]
+            elif distance == best_distance:
+                best_cities.append(city)
+        return best_cities
+
+    def find_nearest(self, lat: float, lon: float, limit: int) -> list[dict]:
+        if self.points is None or limit <= 0:
+            return []
+        query = _unit_vectors([lat], [lon])[0]
+        limit = min(limit, len(self.points))
+        if self.tree is not None:
+            chords, positions = self.tree.query(query, k=limit)
+            chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+        else:
+            chords = np.linalg.norm(self.points - query, axis=1)
+            positions = np.argsort(chords)[:limit]
+            chords = chords[positions]
+        # Chord length on the unit sphere -> great-circle distance.
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chords / 2, 0, 1))
+        results = []
+        for position, distance in zip(positions, distances):
+            record = dict(self.records[self.geo_rows[position]])
+            record['distance_km'] = round(float(distance), 2)
+            results.append(record)
+        return results
+
+
+def _load_index() -> CenterIndex:
+    try:
+        df = pd.read_csv(DATA_PATH)
+        print(f"✅ Location Service: Successfully loaded data from {DATA_PATH}")
+    except FileNotFoundError:
+        print(f"❌ Location Service: FATAL ERROR - Cannot find data file at the corrected path: {DATA_PATH}")
+        # Create an empty dataframe to prevent the app from crashing completely
+        df = pd.DataFrame(columns=COLUMNS)
+    return CenterIndex(df)
+
+
+def _data_mtime():
+    try:
+        return os.path.getmtime(DATA_PATH)
+    except FileNotFoundError:
+        return None
+
+
+_state = {"index": _load_index(), "mtime": _data_mtime(), "checked_at": time.monotonic()}
+_reload_lock = threading.Lock()
+
+
+def get_index() -> CenterIndex:
+    """Returns the current index, rebuilding it if the CSV changed on disk."""
+    now = time.monotonic()
+    if now - _state["checked_at"] >= RELOAD_CHECK_INTERVAL:
+        with _reload_lock:
+            if now - _state["checked_at"] >= RELOAD_CHECK_INTERVAL:
+                _state["checked_at"] = now
+                mtime = _data_mtime()
+                if mtime != _state["mtime"]:
+                    print("♻️ Location Service: legal_aid_centers.csv changed, reloading.")
+                    try:
+                        # Build the new index fully before swapping it in; readers never see a partial one.
+                        _state["index"] = _load_index()
+                        _state["mtime"] = mtime
+                    except Exception as e:
+                        # Most likely caught mid-write; keep serving the old index and retry later.
+                        print(f"⚠️ Location Service: Reload failed, keeping previous data. Error: {e}")
+    return _state["index"]
+
 
 def find_centers(city: str):
-    """Finds legal aid centers in a given city (case-insensitive)."""
-    if not city or df.empty:
-        return []
-    
-    results = df[df['city'].str.lower() == city.lower()]
-    if results.empty:
+    """Finds legal aid centers in a given city (case-insensitive, alias- and typo-tolerant)."""
+    if not city:
         return []
-        
-    return results.to_dict(orient='records')
\ No newline at end of file
+    return get_index().find_by_city(city)
+
+
+def find_nearest_centers(lat: float, lon: float, limit: int = 5):
+    """Finds the centers closest to a point. Needs latitude/longitude columns in the CSV."""
+    return get_index().find_nearest(lat, lon, limit)
@@ -0,0 +1,327 @@
+# app/services/model_host.py
+"""
+Model-host mode: one process owns Whisper, the embedding model and the
+vector store, and every uvicorn worker reaches them over a Unix socket.
+Memory per node then stays flat as workers are added.
+
+Requests and small results are pickled over a multiprocessing connection.
+Large arrays (decoded audio, document embeddings) go through a shared-memory
+block that the calling worker allocates: the host reads or writes it in
+place instead of pickling megabytes through the socket.
+
+Connections unpickle what they receive, so only the host's own user may
+connect: the socket lives in a 0700 directory with mode 0600, and the
+handshake needs MODEL_HOST_AUTHKEY or, when that is unset, the random key
+the host writes to "<socket>.key" (mode 0600).
+
+Run the host, then start the API with the same MODEL_HOST_SOCKET:
+    MODEL_HOST_SOCKET=/tmp/legal-aid-$(id -u)/models.sock python -m app.services.model_host
+    MODEL_HOST_SOCKET=/tmp/legal-aid-$(id -u)/models.sock uvicorn app.main:app --workers 4
+"""
+import argparse
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ..core import config
+from ..core.registry import registry
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"legal-aid-{os.getuid()}", "models.sock")
+
+
+def _key_path(address: str) -> str:
+    return f"{address}.key"
+
+
+def _authkey(address: str) -> bytes:
+    """MODEL_HOST_AUTHKEY, else the key the host generated next to its socket."""
+    if config.MODEL_HOST_AUTHKEY:
+        return config.MODEL_HOST_AUTHKEY.encode("utf-8")
+    try:
+        with open(_key_path(address), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"Model host: No key at {_key_path(address)}; start the host first or set MODEL_HOST_AUTHKEY."
+        ) from None
+
+
+def _private_directory(address: str):
+    """Creates the socket's directory (0700) and refuses one other users can reach."""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise RuntimeError(
+            f"Model host: {directory} must be owned by this user with mode 0700; "
+            f"put MODEL_HOST_SOCKET in a private directory."
+        )
+
+
+def _write_key(address: str) -> bytes:
+    key = secrets.token_hex(32).encode("ascii")
+    path = _key_path(address)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attaches to a block the calling worker owns (and will unlink)."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    block = shared_memory.SharedMemory(name=name)
+    # Before 3.13, attaching also registers the block with this process's
+    # resource tracker, which would unlink it out from under the owner.
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+# --- CLIENT (API workers) ---
+
+class ModelHostClient:
+    """One connection per thread to the model host; reconnects once if the host restarted."""
+
+    def __init__(self, address: str):
+        self.address = address
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = Client(self.address, family="AF_UNIX", authkey=_authkey(self.address))
+            self._local.connection = connection
+        return connection
+
+    def call(self, method: str, *args):
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.send((method, args))
+                status, value = connection.recv()
+                break
+            except (EOFError, OSError):
+                # Every call is a read, so retrying on a fresh connection is safe.
+                self._local.connection = None
+                if attempt:
+                    raise
+        if status == "error":
+            raise RuntimeError(f"Model host: {value}")
+        return value
+
+    @contextmanager
+    def shared_block(self, size: int):
+        block = shared_memory.SharedMemory(create=True, size=max(1, size))
+        try:
+            yield block
+        finally:
+            block.close()
+            block.unlink()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ModelHostClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ModelHostClient(config.MODEL_HOST_SOCKET)
+        return _client
+
+
+class RemoteEmbeddings(Embeddings):
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+        self.dim = client.call("ping")["embedding_dim"]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.client.call("embed_query", text)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        shape = (len(texts), self.dim)
+        with self.client.shared_block(shape[0] * shape[1] * 4) as block:
+            self.client.call("embed_documents", texts, block.name)
+            vectors = np.ndarray(shape, dtype=np.float32, buffer=block.buf).tolist()
+        return vectors
+
+
+class RemoteVectorStore(VectorStore):
+    """Read-only view of the host's vector store; embedding happens on the host."""
+
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+        client.call("ping")
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list[Document]:
+        results = self.client.call("similarity_search", query, k)
+        return [Document(page_content=text, metadata=metadata) for text, metadata in results]
+
+    def search_many(self, vectors: list[list[float]], k: int) -> list[list[Document]]:
+        results = self.client.call("search_many", vectors, k)
+        return [[Document(page_content=text, metadata=metadata) for text, metadata in docs] for docs in results]
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("The API's vector store is read-only; run scripts/ingest_data_ocr.py.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("RemoteVectorStore only wraps the model host's store.")
+
+
+class RemoteWhisper:
+    """Stands in for the Whisper model object in audio_service.transcribe_audio."""
+
+    def __init__(self, client: ModelHostClient):
+        self.client = client
+        client.call("ping")
+
+    def transcribe(self, samples, language=None, fp16=False, **kwargs) -> dict:
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        with self.client.shared_block(samples.nbytes) as block:
+            np.ndarray(samples.shape, dtype=np.float32, buffer=block.buf)[:] = samples
+            text = self.client.call("transcribe", block.name, len(samples), language)
+        return {"text": text}
+
+
+# --- HOST ---
+
+class ModelHost:
+    """Serves the shared models; one thread per worker connection."""
+
+    COMPONENTS = ["whisper", "embeddings", "vector_store"]
+
+    def __init__(self, address: str):
+        from . import audio_service, rag_service
+        self.address = address
+        self.audio = audio_service
+        self.rag = rag_service
+        # Whisper's decoder installs per-call hooks on the model, so
+        # unbatched transcriptions must not overlap.
+        self._whisper_lock = threading.Lock()
+        self.embedding_dim = None
+        self.handlers = {
+            "ping": self.ping,
+            "embed_query": self.embed_query,
+            "embed_documents": self.embed_documents,
+            "similarity_search": self.similarity_search,
+            "search_many": self.search_many,
+            "transcribe": self.transcribe,
+        }
+
+    def ping(self) -> dict:
+        return {"embedding_dim": self.embedding_dim, "components": registry.status(self.COMPONENTS)}
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.rag.get_embeddings().embed_query(text)
+
+    def embed_documents(self, texts: list[str], block_name: str):
+        vectors = np.asarray(self.rag.get_embeddings().embed_documents(texts), dtype=np.float32)
+        block = _attach(block_name)
+        try:
+            np.ndarray(vectors.shape, dtype=np.float32, buffer=block.buf)[:] = vectors
+        finally:
+            block.close()
+        return vectors.shape
+
+    def similarity_search(self, query: str, k: int) -> list[tuple[str, dict]]:
+        docs = self.rag.get_vector_store().similarity_search(query, k=k)
+        return [(doc.page_content, doc.metadata) for doc in docs]
+
+    def search_many(self, vectors: list[list[float]], k: int) -> list[list[tuple[str, dict]]]:
+        results = self.rag.search_many(self.rag.get_vector_store(), vectors, k)
+        return [[(doc.page_content, doc.metadata) for doc in docs] for docs in results]
+
+    def transcribe(self, block_name: str, length: int, language: str) -> str:
+        block = _attach(block_name)
+        try:
+            # Copy the clip out (a few MB at most) so the block can be closed now:
+            # the batcher keeps its last batch alive until the next one arrives,
+            # and a view into block.buf would keep the buffer exported.
+            samples = np.ndarray((length,), dtype=np.float32, buffer=block.buf).copy()
+        finally:
+            block.close()
+        if config.WHISPER_BATCHING:
+            # Requests from every API worker meet here, so batches fill up better.
+            return self.audio.get_batcher().submit_samples(samples, language).result()
+        with self._whisper_lock:
+            result = self.audio.get_whisper_model().transcribe(
+                samples, language=self.audio._language_hint(language), fp16=False
+            )
+        return result["text"]
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.handlers[method](*args))
+                except Exception as e:
+                    print(f"❌ Model Host: '{method}' failed. Error: {e}")
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                connection.send(reply)
+
+    def serve_forever(self):
+        _private_directory(self.address)
+        registry.warm_up(self.COMPONENTS)
+        self.embedding_dim = len(self.embed_query("dimension probe"))
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        authkey = config.MODEL_HOST_AUTHKEY.encode("utf-8") or _write_key(self.address)
+        # Bind with the socket already 0600 rather than chmod-ing it afterwards.
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(umask)
+        os.chmod(self.address, 0o600)
+        with listener:
+            print(f"✅ Model Host: Serving {', '.join(self.COMPONENTS)} on {self.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except (OSError, AuthenticationError) as e:
+                    print(f"⚠️ Model Host: Rejected a connection. Error: {e}")
+                    continue
+                threading.Thread(target=self._serve, args=(connection,), name="model-host-conn", daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Whisper, embeddings and the vector store to API workers.")
+    parser.add_argument("--socket", default=config.MODEL_HOST_SOCKET or DEFAULT_SOCKET)
+    args = parser.parse_args()
+    # This process owns the real models; the registry loaders must not proxy to itself.
+    config.MODEL_HOST_SOCKET = ""
+    try:
+        ModelHost(args.socket).serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for path in (args.socket, _key_path(args.socket)):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,90 @@
 # app/services/rag_service.py
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.llms import Ollama
 from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA, LLMChain
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from ..core import config, executors, telemetry
+from ..core.batching import MicroBatcher
+from ..core.cache import LRUCache, SqliteStore
+from ..core.registry import registry
+from .compact_index import COMPACT_INDEX_DIRNAME, CompactVectorStore
+from .embedding_service import CachedQueryEmbeddings, create_embeddings
+from .lexical_index import LEXICAL_INDEX_FILENAME, LexicalIndex, parse_section_reference
 
 # --- CONFIGURATION ---
 VECTOR_STORE_PATH = "vector_store"
-# ---> CHANGE 2: Using the same superior embedding model for consistency <---
-EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
 LLM_MODEL = "mistral"
+# Written by scripts/ingest_data_ocr.py on every run; cached answers are tied to it.
+INDEX_VERSION_FILE = os.path.join(VECTOR_STORE_PATH, "index_version.txt")
+COMPACT_INDEX_PATH = os.path.join(VECTOR_STORE_PATH, COMPACT_INDEX_DIRNAME)
+RAG_MODE = "Legal Aid (RAG)"
+GENERAL_MODE = "General Chat"
+MODES = (RAG_MODE, GENERAL_MODE)
+
+# --- MODELS AND VECTOR STORE (loaded lazily through the registry) ---
+
+def _load_embeddings():
+    # Same model and backend as ingestion (see embedding_service), plus a query cache.
+    if config.MODEL_HOST_SOCKET:
+        from .model_host import RemoteEmbeddings, get_client
+        print(f"🧠 RAG Service: Using embeddings from the model host at {config.MODEL_HOST_SOCKET}...")
+        return CachedQueryEmbeddings(RemoteEmbeddings(get_client()), config.QUERY_EMBEDDING_CACHE_SIZE)
+    return CachedQueryEmbeddings(create_embeddings(), config.QUERY_EMBEDDING_CACHE_SIZE)
+
+def _load_vector_store():
+    if config.MODEL_HOST_SOCKET:
+        from .model_host import RemoteVectorStore, get_client
+        print(f"🧠 RAG Service: Using the vector store from the model host at {config.MODEL_HOST_SOCKET}...")
+        return RemoteVectorStore(get_client())
+    if config.VECTOR_STORE_BACKEND == "compact":
+        print(f"🧠 RAG Service: Memory-mapping compact vector index at {COMPACT_INDEX_PATH}...")
+        return CompactVectorStore(COMPACT_INDEX_PATH, get_embeddings())
+    print(f"🧠 RAG Service: Opening vector store at {VECTOR_STORE_PATH}...")
+    # Read before opening: if ingestion lands in between, the next check reopens again.
+    _served.update(version=read_index_version(), checked_at=time.monotonic())
+    return Chroma(persist_directory=VECTOR_STORE_PATH, embedding_function=get_embeddings())
+
+def _load_llm():
+    print(f"🧠 RAG Service: Connecting to LLM {LLM_MODEL}...")
+    # keep_alive stops Ollama unloading the model (and dropping its prompt cache) between questions.
+    options = {"num_ctx": config.LLM_NUM_CTX, "keep_alive": config.LLM_KEEP_ALIVE}
+    llm = Ollama(model=LLM_MODEL, **options)
+    if config.LLM_WARMUP:
+        # A one-token generation makes Ollama load the weights now rather than on the first user query.
+        # Same num_ctx as above, or Ollama would reload the model for the first real request.
+        Ollama(model=LLM_MODEL, num_predict=1, **options).invoke("Hello")
+    return llm
+
+registry.register("embeddings", _load_embeddings)
+registry.register("vector_store", _load_vector_store)
+registry.register("llm", _load_llm)
+
+def get_embeddings():
+    return registry.get("embeddings")
 
-# --- LOAD MODELS AND VECTOR STORE ---
-print("🧠 RAG Service: Loading models...")
-try:
-    print(f"   - Embedding Model: {EMBEDDING_MODEL}")
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-    
-    print(f"   - Vector Store: {VECTOR_STORE_PATH}")
-    vector_store = Chroma(persist_directory=VECTOR_STORE_PATH, embedding_function=embeddings)
-    
-    print(f"   - LLM: {LLM_MODEL}")
-    llm = Ollama(model=LLM_MODEL)
-    print(f"✅ RAG Service: Models loaded successfully.")
-except Exception as e:
-    print(f"❌ RAG Service: Critical error loading models: {e}")
-    raise
+def get_vector_store():
+    _reopen_if_reingested()
+    return registry.get("vector_store")
+
+def get_llm():
+    return registry.get("llm")
 
 
 # --- PROMPT ENGINEERING ---
+# Layout: fixed instructions first, then the conversation so far, then the
+# per-question parts. Follow-up prompts share everything up to the newest
+# turn with the previous prompt, so Ollama can reuse that prefix from its cache.
 
 # ---> CHANGE 3: New, extremely strict RAG prompt to prevent hallucinations <---
 RAG_PROMPT_TEMPLATE = """
@@ -39,7 +95,7 @@ RAG_PROMPT_TEMPLATE = """
 3.  If the answer to the question is not found in the Legal Text, you MUST respond with the exact phrase: "I cannot find the answer to that question in the provided document." You are not allowed to say anything else in that case.
 4.  Present the answer in simple, clear terms.
 
-**Legal Text:**
+{history}**Legal Text:**
 ---
 {context}
 ---
@@ -72,34 +128,613 @@ Sahayak: Hello! What can I do for you today?
 User: who are you?
 Sahayak: I am Sahayak, an AI assistant designed to help with legal information and general questions.
 
-**Now, apply these rules to the user's actual message:**
+{history}**Now, apply these rules to the user's actual message:**
 User: {question}
 [/INST]
 Sahayak:
 """
 GENERAL_PROMPT = PromptTemplate.from_template(GENERAL_PROMPT_TEMPLATE)
 
-# --- CREATE THE CHAINS ---
-rag_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    chain_type="stuff",
-    retriever=vector_store.as_retriever(search_kwargs={"k": 2}),
-    chain_type_kwargs={"prompt": RAG_PROMPT}
-)
-general_chain = LLMChain(llm=llm, prompt=GENERAL_PROMPT)
+SUMMARY_PROMPT_TEMPLATE = """
+[INST]
+Summarize the conversation below between a user and a legal aid assistant in at most five sentences.
+Keep every law, section number, deadline, fee and personal circumstance that was mentioned.
+
+{summary}{turns}
+[/INST]
+Summary:
+"""
+SUMMARY_PROMPT = PromptTemplate.from_template(SUMMARY_PROMPT_TEMPLATE)
+
+# --- HYBRID RETRIEVAL ---
+LEXICAL_INDEX_PATH = os.path.join(VECTOR_STORE_PATH, LEXICAL_INDEX_FILENAME)
+LEXICAL_INDEX_CHECK_INTERVAL = 5.0
+_lexical = {"index": None, "mtime": None, "checked_at": None}
+_lexical_lock = threading.Lock()
+
+def get_lexical_index():
+    """
+    Returns the BM25/section index built by ingestion, reloading it when the
+    file is rewritten. Returns None for stores built without one.
+    """
+    now = time.monotonic()
+    if _lexical["checked_at"] is not None and now - _lexical["checked_at"] < LEXICAL_INDEX_CHECK_INTERVAL:
+        return _lexical["index"]
+    with _lexical_lock:
+        _lexical["checked_at"] = now
+        try:
+            mtime = os.path.getmtime(LEXICAL_INDEX_PATH)
+        except FileNotFoundError:
+            _lexical["index"], _lexical["mtime"] = None, None
+            return None
+        if mtime != _lexical["mtime"]:
+            _lexical["index"] = LexicalIndex.load(LEXICAL_INDEX_PATH)
+            _lexical["mtime"] = mtime
+            print(f"🔤 RAG Service: Loaded lexical index ({len(_lexical['index'].ids)} chunks).")
+        return _lexical["index"]
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], k: int, rrf_k: int) -> list[Document]:
+    """Merges ranked lists of documents, scoring each by sum(1 / (rrf_k + rank))."""
+    scores, documents = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses dense hits with BM25 hits. Explicit section references
+    ("Section 6(1)") are answered straight from the section index, with no
+    embedding call; when several Acts have that section, lookup_section puts
+    the one the rest of the question matches first. Falls back to dense-only
+    when there is no lexical index.
+    """
+
+    vector_store: Any
+    k: int = 2
+    fetch_k: int = 8
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        lexical = get_lexical_index()
+        if lexical is None:
+            return self._dense(query, self.k)
+
+        section_hits = lexical.lookup_section(query)
+        if section_hits:
+            return [self._from_lexical(lexical, doc) for doc in section_hits[:self.k]]
+
+        dense = self._dense(query, self.fetch_k)
+        sparse = [self._from_lexical(lexical, doc) for doc, _ in lexical.search(query, self.fetch_k)]
+        return reciprocal_rank_fusion([dense, sparse], self.k, self.rrf_k)
+
+    def _dense(self, query: str, k: int) -> list[Document]:
+        if config.RETRIEVAL_BATCHING:
+            return get_retrieval_batcher().search(query, k)
+        return self.vector_store.similarity_search(query, k=k)
+
+    @staticmethod
+    def _from_lexical(lexical: LexicalIndex, doc: int) -> Document:
+        return Document(page_content=lexical.texts[doc], metadata=dict(lexical.metadatas[doc]))
+
+
+def search_many(vector_store, vectors: list[list[float]], k: int) -> list[list[Document]]:
+    """Top-k documents for each query vector, in one call where the store supports it."""
+    if hasattr(vector_store, "search_many"):  # compact index, model-host proxy
+        return vector_store.search_many(vectors, k)
+    if hasattr(vector_store, "_collection"):  # Chroma: one multi-query lookup
+        results = vector_store._collection.query(
+            query_embeddings=vectors, n_results=k, include=["documents", "metadatas"]
+        )
+        return [
+            [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(results["documents"], results["metadatas"])
+        ]
+    return [vector_store.similarity_search_by_vector(vector, k=k) for vector in vectors]
+
+
+class RetrievalBatcher(MicroBatcher):
+    """
+    Collects dense searches from concurrent questions, embeds all their
+    queries in one batched call and runs one multi-query vector search.
+    Each caller gets its own top-k.
+    """
+
+    def __init__(self, vector_store, embeddings, max_batch: int, window_ms: int):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        super().__init__("retrieval", max_batch, window_ms)
+
+    def search(self, query: str, k: int) -> list[Document]:
+        return self.submit((query, k)).result()
+
+    def process(self, batch):
+        telemetry.RETRIEVAL_BATCH_SIZE.observe(len(batch))
+        queries = list(dict.fromkeys(query for (query, _), _ in batch))
+        embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+        results = search_many(self.vector_store, embed(queries), max(k for (_, k), _ in batch))
+        by_query = dict(zip(queries, results))
+        for (query, k), future in batch:
+            future.set_result(by_query[query][:k])
+
+
+_retrieval_batcher = None
+_retrieval_batcher_lock = threading.Lock()
+
+
+def get_retrieval_batcher() -> RetrievalBatcher:
+    global _retrieval_batcher
+    with _retrieval_batcher_lock:
+        if _retrieval_batcher is None:
+            _retrieval_batcher = RetrievalBatcher(
+                get_vector_store(), get_embeddings(), config.RETRIEVAL_MAX_BATCH, config.RETRIEVAL_BATCH_WINDOW_MS
+            )
+        return _retrieval_batcher
+
+
+def retrieval_batch_stats() -> dict:
+    if _retrieval_batcher is None:
+        return {"enabled": config.RETRIEVAL_BATCHING, "batches": 0}
+    return {"enabled": config.RETRIEVAL_BATCHING, **_retrieval_batcher.stats()}
+
+def _load_retriever():
+    if not config.HYBRID_RETRIEVAL:
+        return get_vector_store().as_retriever(search_kwargs={"k": config.RETRIEVAL_K})
+    get_lexical_index()
+    return HybridRetriever(
+        vector_store=get_vector_store(),
+        k=config.RETRIEVAL_K,
+        fetch_k=config.RETRIEVAL_FETCH_K,
+        rrf_k=config.RRF_K,
+    )
+
+
+registry.register("retriever", _load_retriever)
+
+def get_retriever():
+    _reopen_if_reingested()
+    return registry.get("retriever")
+
+# Everything a chat request needs, in load order; used for warm-up and /ready.
+WARM_UP_COMPONENTS = ["embeddings", "vector_store", "llm", "retriever"]
+
+
+# --- RELOADING AFTER RE-INGESTION ---
+# Chroma keeps its index in memory and does not see another process's writes.
+# When ingestion writes a new index_version.txt, the store, the retriever built
+# on it and the retrieval batcher switch to a freshly opened one. The compact
+# store follows new builds by itself (CompactVectorStore.current).
+VECTOR_STORE_CHECK_INTERVAL = 5.0
+_served = {"version": None, "checked_at": None}  # set when this process opens Chroma
+_served_lock = threading.RLock()  # reopening rebuilds the retriever, which gets the store again
+
+def _forget_chroma_clients():
+    # Chroma shares one client system (and its loaded index) per path; drop it
+    # so the next Chroma() reads what ingestion wrote. Open handles keep working.
+    try:
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+    except (ImportError, AttributeError):
+        pass
+
+def _reopen_if_reingested():
+    if _served["version"] is None:  # not serving Chroma from this process
+        return
+    now = time.monotonic()
+    if now - _served["checked_at"] < VECTOR_STORE_CHECK_INTERVAL:
+        return
+    with _served_lock:
+        if now - _served["checked_at"] < VECTOR_STORE_CHECK_INTERVAL:
+            return
+        _served["checked_at"] = now
+        version = read_index_version()
+        if version == _served["version"]:
+            return
+        print(f"♻️ RAG Service: Index changed ({_served['version']} -> {version}). Reopening the vector store.")
+        try:
+            _forget_chroma_clients()
+            store = _load_vector_store()
+        except Exception as e:
+            print(f"⚠️ RAG Service: Reopen failed, keeping the open store. Error: {e}")
+            return
+        registry.override("vector_store", store)
+        if registry.is_ready(["retriever"]):
+            registry.override("retriever", _load_retriever())
+        if _retrieval_batcher is not None:
+            _retrieval_batcher.vector_store = store
+        _lexical["checked_at"] = None  # and look for a new lexical index on the next query
+
+
+# --- ANSWER CACHE ---
+
+def get_index_version() -> str:
+    """Identifies the build of the vector store that retrieval is using."""
+    if config.VECTOR_STORE_BACKEND == "compact" and registry.is_ready(["vector_store"]):
+        # The compact store switches to a new build a few seconds after ingestion;
+        # follow the build it serves so stale hits are never cached under the new version.
+        version = getattr(get_vector_store(), "version", "")
+        if version:
+            return version
+    if _served["version"] is not None:
+        # Likewise for Chroma: reopen first if ingestion has run, then report what is served.
+        _reopen_if_reingested()
+        return _served["version"]
+    return read_index_version()
+
+
+def read_index_version() -> str:
+    """The version ingestion last wrote."""
+    try:
+        with open(INDEX_VERSION_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        # Stores built before versioning was added: use Chroma's own file instead.
+        sqlite_path = os.path.join(VECTOR_STORE_PATH, "chroma.sqlite3")
+        return str(os.path.getmtime(sqlite_path)) if os.path.exists(sqlite_path) else "unversioned"
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, strips punctuation and collapses whitespace."""
+    query = re.sub(r"[^\w\s()]", " ", query.lower())
+    return " ".join(query.split())
+
 
-def get_response(query: str, mode: str):
+class AnswerCache:
     """
-    Gets a response from the appropriate chain based on the selected mode.
+    Caches final English answers keyed on (mode, normalized query).
+
+    Two tiers are checked in order:
+      1. exact match on the normalized query (in memory, then on disk if configured)
+      2. for RAG mode, embedding similarity against previously answered
+         questions, reusing the same bge-small embeddings as retrieval
+
+    Every entry belongs to one vector store version; when ingestion is re-run
+    the version changes and the whole cache is dropped.
+    """
+
+    VERSION_CHECK_INTERVAL = 5.0
+
+    def __init__(self, embed_fn, max_entries: int, ttl_seconds: float, similarity: float, path: str = ""):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._exact = LRUCache(max_entries, ttl_seconds)
+        self._vectors: OrderedDict = OrderedDict()  # key -> (unit vector, answer, stored_at)
+        self._recent_vectors = LRUCache(256)        # query vectors computed by lookup(), reused by store()
+        self._store = SqliteStore(path, table="answers") if path else None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.version = get_index_version()
+        self._version_checked_at = time.monotonic()
+        self._load_persisted()
+
+    @staticmethod
+    def _key(mode: str, normalized: str) -> str:
+        return f"{mode}|{normalized}"
+
+    def _load_persisted(self):
+        if not self._store:
+            return
+        for key, record in self._store.items():
+            if record.get("version") != self.version:
+                self._store.delete(key)
+                continue
+            self._exact.set(key, record["answer"])
+            if record.get("vector") is not None:
+                self._remember_vector(key, np.asarray(record["vector"], dtype=np.float32), record["answer"])
+
+    def _semantic_tier_applies(self, query: str, mode: str) -> bool:
+        # Only RAG answers are worth an extra embedding call; general chat is cheap to regenerate.
+        # Questions about different sections embed almost identically, so those only match exactly.
+        return self.similarity > 0 and mode == RAG_MODE and parse_section_reference(query) is None
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._version_checked_at < self.VERSION_CHECK_INTERVAL:
+            return
+        self._version_checked_at = now
+        version = get_index_version()
+        if version != self.version:
+            print(f"♻️ RAG Service: Vector store changed ({self.version} -> {version}). Clearing answer cache.")
+            self.clear()
+            self.version = version
+
+    def _embed(self, query: str) -> np.ndarray:
+        # The raw query, as the retriever embeds it, so both share one cached embedding.
+        vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remember_vector(self, key: str, vector: np.ndarray, answer: str):
+        with self._lock:
+            self._vectors[key] = (vector, answer, time.time())
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    def _semantic_lookup(self, mode: str, vector: np.ndarray):
+        with self._lock:
+            candidates = [(key, entry) for key, entry in self._vectors.items() if key.startswith(f"{mode}|")]
+        if not candidates:
+            return None
+        matrix = np.stack([entry[0] for _, entry in candidates])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        key, (_, answer, stored_at) = candidates[best]
+        if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+            return None
+        return answer
+
+    def lookup(self, query: str, mode: str):
+        """Returns a cached answer or None."""
+        self._check_version()
+        normalized = normalize_query(query)
+        key = self._key(mode, normalized)
+
+        answer = self._exact.get(key)
+        if answer is None and self._store:
+            record = self._store.get(key, self.ttl_seconds)
+            if record and record.get("version") == self.version:
+                answer = record["answer"]
+                self._exact.set(key, answer)
+        if answer is not None:
+            self.exact_hits += 1
+            return answer
+
+        if self._semantic_tier_applies(query, mode):
+            vector = self._embed(query)
+            self._recent_vectors.set(key, vector)
+            answer = self._semantic_lookup(mode, vector)
+            if answer is not None:
+                self.semantic_hits += 1
+                self._exact.set(key, answer)
+                return answer
+
+        self.misses += 1
+        return None
+
+    def store(self, query: str, mode: str, answer: str):
+        if not answer:
+            return
+        normalized = normalize_query(query)
+        key = self._key(mode, normalized)
+        self._exact.set(key, answer)
+        vector = None
+        if self._semantic_tier_applies(query, mode):
+            vector = self._recent_vectors.pop(key)
+            if vector is None:
+                vector = self._embed(query)
+            self._remember_vector(key, vector, answer)
+        if self._store:
+            self._store.set(key, {
+                "answer": answer,
+                "version": self.version,
+                "vector": vector.tolist() if vector is not None else None,
+            })
+
+    def clear(self):
+        self._exact.clear()
+        self._recent_vectors.clear()
+        with self._lock:
+            self._vectors.clear()
+        if self._store:
+            self._store.clear()
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._exact),
+            "semantic_entries": len(self._vectors),
+            "evictions": self._exact.stats.evictions,
+            "index_version": self.version,
+        }
+
+
+answer_cache = None
+if config.ANSWER_CACHE_ENABLED:
+    answer_cache = AnswerCache(
+        embed_fn=lambda text: get_embeddings().embed_query(text),
+        max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+        similarity=config.ANSWER_CACHE_SIMILARITY,
+        path=config.ANSWER_CACHE_PATH,
+    )
+
+
+def cache_stats() -> dict:
+    return answer_cache.stats() if answer_cache else {"enabled": False}
+
+def embedding_cache_stats() -> dict:
+    # Doesn't force the model to load just to report stats.
+    if not registry.is_ready(["embeddings"]):
+        return {"loaded": False}
+    return get_embeddings().stats()
+
+
+# --- CONVERSATIONS ---
+
+def estimate_tokens(text: str) -> int:
+    # About four characters per token for English with Mistral's tokenizer; close enough for budgeting.
+    return len(text) // 4 + 1
+
+
+def format_history(summary: str, turns: list) -> str:
+    """The conversation block placed between the instructions and the question; empty for a new conversation."""
+    if not summary and not turns:
+        return ""
+    lines = ["**Conversation so far** (use it only to understand what the question refers to):"]
+    if summary:
+        lines.append(f"Summary of earlier turns: {summary}")
+    for user, assistant in turns:
+        lines.append(f"User: {user}")
+        lines.append(f"Assistant: {assistant}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Conversation:
+    def __init__(self):
+        self.summary = ""
+        self.turns: list[tuple[str, str]] = []
+        self.compacting = False
+        self.lock = threading.Lock()
+
+
+class ConversationStore:
+    """
+    Server-side conversation history keyed by the client's session_id.
+
+    Turns are only appended between compactions, so consecutive prompts in a
+    conversation keep a long identical prefix. When the turns outgrow the
+    token budget, the oldest are summarized on the LLM stage in the
+    background until half the budget is left. The prefix therefore changes
+    only once every few turns, not on every question.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, token_budget: int):
+        self.sessions = LRUCache(max_entries, ttl_seconds)
+        self.token_budget = token_budget
+        self.compactions = 0
+
+    def history(self, session_id: str) -> str:
+        conversation = self.sessions.get(session_id) if session_id else None
+        if conversation is None:
+            return ""
+        with conversation.lock:
+            return format_history(conversation.summary, conversation.turns)
+
+    def record(self, session_id: str, query: str, answer: str):
+        if not session_id or not answer:
+            return
+        conversation = self.sessions.get(session_id) or Conversation()
+        self.sessions.set(session_id, conversation)  # Also restarts the idle timer.
+        with conversation.lock:
+            conversation.turns.append((query, answer))
+            tokens = self._tokens(conversation.turns)
+            # Hard cap in case summarizing falls behind or keeps failing.
+            while tokens > 2 * self.token_budget and len(conversation.turns) > 1:
+                tokens -= self._tokens(conversation.turns[:1])
+                del conversation.turns[0]
+            if tokens > self.token_budget and not conversation.compacting:
+                conversation.compacting = True
+                executors.LLM.executor.submit(self._compact, conversation)
+
+    @staticmethod
+    def _tokens(turns) -> int:
+        return sum(estimate_tokens(user) + estimate_tokens(assistant) for user, assistant in turns)
+
+    def _compact(self, conversation: Conversation):
+        with conversation.lock:
+            keep = len(conversation.turns)
+            while keep > 1 and self._tokens(conversation.turns[-keep:]) > self.token_budget // 2:
+                keep -= 1
+            old_turns = conversation.turns[:-keep]
+            summary = conversation.summary
+            if not old_turns:
+                conversation.compacting = False
+                return
+        try:
+            new_summary = summarize(summary, old_turns)
+        except Exception as e:
+            print(f"⚠️ RAG Service: Could not summarize conversation, will retry on the next turn. Error: {e}")
+            new_summary = None
+        with conversation.lock:
+            if new_summary:
+                conversation.summary = new_summary
+                summarized = {id(turn) for turn in old_turns}
+                conversation.turns = [turn for turn in conversation.turns if id(turn) not in summarized]
+                self.compactions += 1
+            conversation.compacting = False
+
+    def stats(self) -> dict:
+        return {"sessions": len(self.sessions), "compactions": self.compactions}
+
+
+def summarize(summary: str, turns: list) -> str:
+    previous = f"Summary of earlier turns: {summary}\n" if summary else ""
+    transcript = "\n".join(f"User: {user}\nAssistant: {assistant}" for user, assistant in turns)
+    return get_llm().invoke(SUMMARY_PROMPT.format(summary=previous, turns=transcript)).strip()
+
+
+sessions = ConversationStore(config.SESSION_MAX_ENTRIES, config.SESSION_TTL_SECONDS, config.HISTORY_TOKEN_BUDGET)
+
+
+def prepare_response(query: str, mode: str, history: str = "") -> dict:
+    """
+    Everything before generation: the answer-cache lookup, then retrieval.
+    Runs on the retrieval stage, so concurrent questions meet in the
+    retrieval batcher instead of queueing behind the LLM's few slots.
+    Returns {"answer", "cached"} on a cache hit, else {"prompt"}. Retrieval
+    errors are raised.
+    """
+    if answer_cache is not None and not history:
+        cached = answer_cache.lookup(query, mode)
+        if cached is not None:
+            print(f"⚡ Answer cache hit in '{mode}' mode. Query: '{query}'")
+            telemetry.set_attributes(answer_cache="hit")
+            return {"answer": cached, "cached": True}
+    return {"prompt": build_prompt(query, mode, history)}
+
+def get_response(query: str, mode: str, history: str = "", prepared: dict = None):
+    """
+    Answers the query in the given mode. `history` is the block returned by
+    sessions.history(); answers that depend on a conversation aren't cached.
+    Pass the result of prepare_response() to skip straight to generation.
     """
-    print(f"🔍 Querying in '{mode}' mode with LLM '{LLM_MODEL}'. Query: '{query}'")
     try:
-        if mode == "Legal Aid (RAG)":
-            response = rag_chain.invoke({"query": query})
-            return {"answer": response.get("result", "No answer found.")}
-        else: # General Chat
-            response = general_chain.invoke({"question": query})
-            return {"answer": response.get("text", "I am not sure how to respond.")}
+        prepared = prepared or prepare_response(query, mode, history)
+        if "prompt" not in prepared:
+            return prepared
+        print(f"🔍 Querying in '{mode}' mode with LLM '{LLM_MODEL}'. Query: '{query}'")
+        answer = get_llm().invoke(prepared["prompt"], config={"callbacks": telemetry.CALLBACKS}).strip()
     except Exception as e:
-        print(f"❌ Error during chain invocation: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        print(f"❌ Error during LLM invocation: {e}")
+        return {"error": str(e)}
+    if not answer:
+        answer = "No answer found." if mode == RAG_MODE else "I am not sure how to respond."
+
+    if answer_cache is not None and not history:
+        answer_cache.store(query, mode, answer)
+    return {"answer": answer}
+
+def build_prompt(query: str, mode: str, history: str = "") -> str:
+    """
+    Builds the prompt for either mode. Retrieval uses the current question
+    only; the history is there for the LLM to resolve follow-ups.
+    """
+    if mode == RAG_MODE:
+        docs = get_retriever().invoke(query, config={"callbacks": telemetry.CALLBACKS})
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return RAG_PROMPT.format(context=context, question=query, history=history)
+    return GENERAL_PROMPT.format(question=query, history=history)
+
+def stream_response(query: str, mode: str, history: str = "", prepared: dict = None):
+    """
+    Yields the answer token by token as Ollama generates it.
+    Errors are raised to the caller, which decides how to report them mid-stream.
+    """
+    prepared = prepared or prepare_response(query, mode, history)
+    if "prompt" not in prepared:
+        yield prepared["answer"]
+        return
+
+    print(f"🔍 Streaming in '{mode}' mode with LLM '{LLM_MODEL}'. Query: '{query}'")
+    parts = []
+    for token in get_llm().stream(prepared["prompt"], config={"callbacks": telemetry.CALLBACKS}):
+        if token:
+            parts.append(token)
+            yield token
+
+    if answer_cache is not None and not history:
+        answer_cache.store(query, mode, "".join(parts).strip())
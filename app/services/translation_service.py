@@ -1,15 +1,174 @@
 # app/services/translation_service.py
+import hashlib
+import threading
+
 from deep_translator import GoogleTranslator
 
+from ..core import config
+from ..core.cache import CacheStats, LRUCache, SqliteStore
+from ..core.text_utils import split_sentences
+
+
+# --- BACKENDS ---
+
+class GoogleBackend:
+    """Google Translate via deep-translator, reusing one translator per language pair and thread."""
+
+    name = "google"
+    # Google rejects requests above 5000 characters.
+    MAX_REQUEST_CHARS = 4500
+    SEPARATOR = "\n"
+
+    def __init__(self):
+        # GoogleTranslator.translate() stores the text on the instance before
+        # sending it, so one instance must never be used by two threads at once.
+        self._local = threading.local()
+
+    def _translator(self, source: str, target: str) -> GoogleTranslator:
+        translators = getattr(self._local, "translators", None)
+        if translators is None:
+            translators = self._local.translators = {}
+        translator = translators.get((source, target))
+        if translator is None:
+            translator = translators[(source, target)] = GoogleTranslator(source=source, target=target)
+        return translator
+
+    def translate(self, text: str, target: str, source: str) -> str:
+        return self._translator(source, target).translate(text)
+
+    def translate_many(self, texts: list[str], target: str, source: str) -> list[str]:
+        """
+        Packs several single-line texts into as few requests as possible,
+        one per line, and splits the response back apart.
+        """
+        results = []
+        for group in self._pack(texts):
+            joined = self.translate(self.SEPARATOR.join(group), target, source) or ""
+            parts = [part.strip() for part in joined.split(self.SEPARATOR) if part.strip()]
+            if len(parts) != len(group):
+                # Google occasionally merges or splits lines; fall back to one call each.
+                parts = [self.translate(text, target, source) for text in group]
+            results.extend(parts)
+        return results
+
+    def _pack(self, texts: list[str]):
+        group, size = [], 0
+        for text in texts:
+            if group and size + len(text) + 1 > self.MAX_REQUEST_CHARS:
+                yield group
+                group, size = [], 0
+            group.append(text)
+            size += len(text) + 1
+        if group:
+            yield group
+
+
+class IdentityBackend:
+    """Offline stand-in that returns text unchanged. Useful for tests and local runs."""
+
+    name = "identity"
+
+    def translate(self, text: str, target: str, source: str) -> str:
+        return text
+
+    def translate_many(self, texts: list[str], target: str, source: str) -> list[str]:
+        return list(texts)
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend, IdentityBackend)}
+
+backend = BACKENDS[config.TRANSLATION_BACKEND]()
+
+
+def set_backend(new_backend):
+    """Swaps the translation backend, e.g. for an offline stand-in. Clears the memory cache."""
+    global backend
+    backend = new_backend
+    _memory.clear()
+
+
+# --- CACHE ---
+_memory = LRUCache(config.TRANSLATION_CACHE_MAX_ENTRIES)
+_store = SqliteStore(config.TRANSLATION_CACHE_PATH, table="translations") if config.TRANSLATION_CACHE_PATH else None
+_store_stats = CacheStats()
+
+
+def _cache_key(text: str, target_lang: str, source_lang: str) -> str:
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{backend.name}:{source_lang}:{target_lang}:{digest}"
+
+
+def _lookup(keys: list[str]) -> dict:
+    found = {}
+    missing = []
+    for key in keys:
+        value = _memory.get(key)
+        if value is None:
+            missing.append(key)
+        else:
+            found[key] = value
+    if missing and _store:
+        persisted = _store.get_many(missing)
+        _store_stats.hits += len(persisted)
+        _store_stats.misses += len(missing) - len(persisted)
+        for key, value in persisted.items():
+            _memory.set(key, value)
+        found.update(persisted)
+    return found
+
+
+def _remember(items: dict):
+    for key, value in items.items():
+        _memory.set(key, value)
+    if _store:
+        _store.set_many(items)
+
+
+def translate_batch(texts: list[str], target_lang: str, source_lang: str = 'auto') -> list[str]:
+    """
+    Translates a list of texts, sending only the cache misses to the backend
+    (deduplicated and packed into as few round trips as possible).
+    Texts that fail to translate are returned unchanged.
+    """
+    if not texts:
+        return []
+    keys = [_cache_key(text, target_lang, source_lang) for text in texts]
+    cached = _lookup(list(dict.fromkeys(keys)))
+
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in misses and text.strip():
+            misses[key] = text
+
+    if misses:
+        try:
+            translated = backend.translate_many(list(misses.values()), target_lang, source_lang)
+            fresh = {key: value for key, value in zip(misses, translated) if value}
+            _remember(fresh)
+            cached.update(fresh)
+        except Exception as e:
+            print(f"Translation error: {e}")
+
+    return [cached.get(key, text) for key, text in zip(keys, texts)]
+
+
 def translate_text(text: str, target_lang: str, source_lang: str = 'auto'):
-    """Translates text using Google Translate."""
+    """
+    Translates text using the configured backend. Multi-sentence text is
+    translated sentence by sentence so repeated sentences come from the cache;
+    line breaks are preserved.
+    """
     if not text:
         return ""
-    try:
-        # For some languages, Google uses different codes (e.g., Kannada is kn)
-        if target_lang == "kn": 
-            target_lang = "kn"
-        return GoogleTranslator(source=source_lang, target=target_lang).translate(text)
-    except Exception as e:
-        print(f"Translation error: {e}")
-        return text # Return original text on error
\ No newline at end of file
+    lines = text.split("\n")
+    sentences_per_line = [split_sentences(line) for line in lines]
+    flat = [sentence for sentences in sentences_per_line for sentence in sentences]
+    translated = iter(translate_batch(flat, target_lang, source_lang))
+    return "\n".join(" ".join(next(translated) for _ in sentences) for sentences in sentences_per_line)
+
+
+def cache_stats() -> dict:
+    stats = {"backend": backend.name, "memory": _memory.stats.as_dict(), "entries": len(_memory)}
+    if _store:
+        stats["persistent"] = _store_stats.as_dict()
+    return stats
@@ -0,0 +1,114 @@
+# scripts/benchmark_embeddings.py
+"""
+Compares the HuggingFace (PyTorch) and ONNX int8 embedding backends on
+load time, query latency, batch throughput and retrieval agreement.
+
+Run from the project root after ingestion:
+    python scripts/benchmark_embeddings.py --queries 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.services.embedding_service import create_embeddings
+from app.services.lexical_index import LEXICAL_INDEX_FILENAME, LexicalIndex
+
+VECTOR_STORE_PATH = "vector_store"
+
+SAMPLE_QUERIES = [
+    "How do I file an RTI application?",
+    "What is the fee for an RTI request?",
+    "How many days does the public information officer have to reply?",
+    "What information is exempt from disclosure?",
+    "Who can I appeal to if my request is rejected?",
+    "What is the penalty for not providing information?",
+    "Can information about a third party be disclosed?",
+    "How is the Central Information Commission constituted?",
+    "Do I have to give a reason for asking for information?",
+    "Which organisations are excluded from the Act?",
+]
+
+
+def load_corpus(limit: int) -> list[str]:
+    path = os.path.join(VECTOR_STORE_PATH, LEXICAL_INDEX_FILENAME)
+    if not os.path.exists(path):
+        print(f"❌ {path} not found. Run scripts/ingest_data_ocr.py first.")
+        sys.exit(1)
+    return LexicalIndex.load(path).texts[:limit]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def unit(vectors: list[list[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def benchmark_backend(name: str, corpus: list[str], queries: list[str]) -> dict:
+    start = time.perf_counter()
+    embeddings = create_embeddings(name)
+    load_seconds = time.perf_counter() - start
+
+    embeddings.embed_query("warm up")
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    doc_vectors = embeddings.embed_documents(corpus)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "load_s": load_seconds,
+        "query_p50_ms": statistics.median(latencies),
+        "query_p95_ms": percentile(latencies, 95),
+        "docs_per_s": len(corpus) / batch_seconds if batch_seconds else float("inf"),
+        "queries": unit(query_vectors),
+        "docs": unit(doc_vectors),
+    }
+
+
+def top_k(queries: np.ndarray, docs: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ docs.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100, help="Number of query embeddings to time.")
+    parser.add_argument("--corpus", type=int, default=2000, help="Maximum number of chunks to embed.")
+    parser.add_argument("--k", type=int, default=2, help="Top-k used for retrieval agreement.")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    queries = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] for i in range(args.queries)]
+    print(f"📚 {len(corpus)} chunks, {len(queries)} queries")
+
+    results = {name: benchmark_backend(name, corpus, queries) for name in ("huggingface", "onnx")}
+
+    print(f"\n{'backend':<12} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'docs/s':>9}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['load_s']:>8.2f} {r['query_p50_ms']:>8.2f} {r['query_p95_ms']:>8.2f} {r['docs_per_s']:>9.1f}")
+
+    hf, onnx = results["huggingface"], results["onnx"]
+    cosine = np.sum(hf["docs"] * onnx["docs"], axis=1)
+    hf_top, onnx_top = top_k(hf["queries"], hf["docs"], args.k), top_k(onnx["queries"], onnx["docs"], args.k)
+    overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(hf_top, onnx_top)])
+    top1 = np.mean(hf_top[:, 0] == onnx_top[:, 0])
+    print(f"\nMean cosine(HF, ONNX) per chunk: {cosine.mean():.4f} (min {cosine.min():.4f})")
+    print(f"Retrieval agreement: top-1 {top1:.1%}, overlap@{args.k} {overlap:.1%}")
+
+
+if __name__ == "__main__":
+    main()
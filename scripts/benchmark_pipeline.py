@@ -0,0 +1,498 @@
+# scripts/benchmark_pipeline.py
+"""
+Offline load and latency benchmark for the chat API.
+
+Drives the FastAPI app in-process with a configurable request mix. Ollama,
+Google Translate and gTTS are replaced by deterministic local stand-ins
+with tunable latency, and so are the embedding model, the vector store and
+(unless --real-whisper is given) Whisper. The run needs no network and no GPU.
+Reports throughput and p50/p95/p99 latency end to end, per request type
+and per pipeline stage. It also covers /find_aid_centers and ingestion.
+
+Run from the project root:
+    python scripts/benchmark_pipeline.py --requests 200 --concurrency 16
+    python scripts/benchmark_pipeline.py --llm-ms 2000 --audio-ratio 0.5 --json bench.json
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from collections import defaultdict
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Offline, isolated defaults. These must be set before the app is imported.
+_CACHE_DIR = tempfile.mkdtemp(prefix="legal-aid-bench-")
+for _name, _value in {
+    "TRANSLATION_BACKEND": "identity",
+    "TTS_BACKEND": "silent",
+    "TRANSLATION_CACHE_PATH": "",
+    "ANSWER_CACHE_PATH": "",
+    "DEFERRED_AUDIO_PATH": "",
+    "TTS_CACHE_DIR": os.path.join(_CACHE_DIR, "tts"),
+    "TTS_PREWARM": "0",
+    "WARM_UP_ON_STARTUP": "0",
+    "LLM_WARMUP": "0",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app.core import executors
+from app.core.registry import registry
+from app.main import app
+from app.services import audio_service, rag_service, translation_service
+from app.services.embedding_service import CachedQueryEmbeddings
+from app.services.lexical_index import LexicalIndex
+
+RAG_MODE = rag_service.RAG_MODE
+GENERAL_MODE = "General Chat"
+INDIC_LANGUAGES = ["hi", "kn", "ta", "te", "ml"]
+
+SAMPLE_QUESTIONS = [
+    "How do I file an RTI application?",
+    "What is the fee for an RTI request?",
+    "How many days does the public information officer have to reply?",
+    "What information is exempt from disclosure under Section 8?",
+    "Who can I appeal to if my request is rejected?",
+    "What is the penalty for not providing information?",
+    "Can information about a third party be disclosed?",
+    "What does Section 6(1) say?",
+    "Do I have to give a reason for asking for information?",
+    "Which organisations are excluded from the Act?",
+]
+GREETINGS = ["hello", "good morning", "who are you?", "thank you", "hi there"]
+CITY_QUERIES = ["Bangalore", "Bengaluru", "New Delhi", "Delhi", "Mumbay", "Hyderabad", "Chennai", "Nowhere"]
+
+
+# --- STAND-INS ---
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class StandInLLM(LLM):
+    """Deterministic Ollama replacement: waits `first_token_ms`, then emits tokens every `token_ms`."""
+
+    first_token_ms: float = 300.0
+    token_ms: float = 15.0
+    tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "stand-in"
+
+    def _words(self, prompt: str) -> list[str]:
+        rng = random.Random(_digest(prompt))
+        vocabulary = "the applicant may request information from the public authority within thirty days".split()
+        words = []
+        while len(words) < self.tokens:
+            sentence = [rng.choice(vocabulary) for _ in range(rng.randint(8, 14))]
+            sentence[0] = sentence[0].capitalize()
+            sentence[-1] += "."
+            words.extend(sentence)
+        return words
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs) -> str:
+        words = self._words(prompt)
+        time.sleep((self.first_token_ms + self.token_ms * len(words)) / 1000)
+        return " ".join(words)
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_ms / 1000)
+        for word in self._words(prompt):
+            time.sleep(self.token_ms / 1000)
+            yield GenerationChunk(text=word + " ")
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings, with an optional simulated model cost."""
+
+    def __init__(self, dim: int = 384, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency = latency_ms / 1000
+
+    def _vector(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            h = _digest(word)
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency * max(1, len(texts) // 32))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._vector(text)
+
+
+class LatencyTranslationBackend:
+    """Google Translate replacement: one simulated round trip per call."""
+
+    name = "bench"
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def translate(self, text, target, source):
+        time.sleep(self.latency)
+        return f"[{target}] {text}"
+
+    def translate_many(self, texts, target, source):
+        time.sleep(self.latency)
+        return [f"[{target}] {text}" for text in texts]
+
+
+class LatencyTTSBackend:
+    """gTTS replacement: latency grows with text length, returns deterministic bytes."""
+
+    name = "bench"
+
+    def __init__(self, latency_ms: float, ms_per_char: float):
+        self.latency = latency_ms / 1000
+        self.per_char = ms_per_char / 1000
+
+    def synthesize(self, text, lang):
+        time.sleep(self.latency + self.per_char * len(text))
+        return hashlib.sha256(f"{lang}:{text}".encode("utf-8")).digest() * 16
+
+
+class StandInWhisper:
+    """Whisper replacement that returns one of the sample questions."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def transcribe(self, samples, language=None, fp16=False, **kwargs):
+        time.sleep(self.latency)
+        return {"text": SAMPLE_QUESTIONS[len(samples) % len(SAMPLE_QUESTIONS)]}
+
+
+def decode_wav(audio_bytes: bytes) -> np.ndarray:
+    """ffmpeg-free decoder for the 16 kHz mono WAVs this benchmark uploads."""
+    with wave.open(io.BytesIO(audio_bytes)) as wav:
+        frames = wav.readframes(wav.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def make_wav(seconds: float, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(int(16000 * seconds)) * 3000).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def load_corpus() -> list[tuple[str, dict]]:
+    """Chunks from the real lexical index when present, otherwise synthetic legal text."""
+    path = rag_service.LEXICAL_INDEX_PATH
+    if os.path.exists(path):
+        index = LexicalIndex.load(path)
+        return list(zip(index.texts, index.metadatas))
+    rng = random.Random(0)
+    words = "information public authority request officer appeal commission section fee days penalty disclosure".split()
+    corpus = []
+    for section in range(1, 32):
+        for part in range(3):
+            body = " ".join(rng.choice(words) for _ in range(180))
+            text = f"{section}. Heading of section {section}.—({part + 1}) {body}" if part == 0 else f"({part + 1}) {body}"
+            corpus.append((text, {"source": "synthetic.pdf", "page": section, "chunk": part}))
+    return corpus
+
+
+def install_stand_ins(args, recorder):
+    corpus = load_corpus()
+    embeddings = HashEmbeddings(latency_ms=args.embed_ms)
+    store = InMemoryVectorStore(embedding=embeddings)
+    store.add_texts([text for text, _ in corpus], metadatas=[meta for _, meta in corpus])
+
+    lexical_path = os.path.join(_CACHE_DIR, "lexical_index.json")
+    LexicalIndex.build([str(i) for i in range(len(corpus))], [t for t, _ in corpus], [m for _, m in corpus]).save(lexical_path)
+    rag_service.LEXICAL_INDEX_PATH = lexical_path
+
+    registry.override("embeddings", CachedQueryEmbeddings(embeddings, 4096))
+    registry.override("vector_store", store)
+    registry.override("llm", StandInLLM(first_token_ms=args.llm_ms, token_ms=args.token_ms, tokens=args.answer_tokens))
+    translation_service.set_backend(LatencyTranslationBackend(args.translate_ms))
+    audio_service.set_tts_backend(LatencyTTSBackend(args.tts_ms, args.tts_ms_per_char))
+
+    if not args.real_whisper:
+        # Run the Whisper stage in threads so the stand-in (not a real model in
+        # a child process) handles transcription.
+        registry.override("whisper", StandInWhisper(args.whisper_ms))
+        audio_service.decode_audio = decode_wav
+        executors.WHISPER = executors.Stage("whisper", executors.WHISPER.workers)
+        executors.STAGES["whisper"] = executors.WHISPER
+
+    if args.no_cache:
+        rag_service.answer_cache = None
+        translation_service._memory.max_entries = 0
+        audio_service.audio_cache.memory.max_entries = 0
+        audio_service.audio_cache.directory = ""
+
+    instrument(recorder)
+    return len(corpus)
+
+
+# --- MEASUREMENT ---
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def add(self, name: str, seconds: float):
+        self.samples[name].append(seconds * 1000)
+
+
+def instrument(recorder: Recorder):
+    """Times every executor stage (including queueing) and retrieval."""
+    for stage in executors.STAGES.values():
+        original = stage.run
+
+        async def timed(fn, *args, _original=original, _name=stage.name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await _original(fn, *args, **kwargs)
+            finally:
+                recorder.add(f"stage:{_name}", time.perf_counter() - start)
+
+        stage.run = timed
+
+    original_retrieve = rag_service.HybridRetriever._get_relevant_documents
+
+    def timed_retrieve(self, query, *, run_manager):
+        start = time.perf_counter()
+        try:
+            return original_retrieve(self, query, run_manager=run_manager)
+        finally:
+            recorder.add("stage:retrieval", time.perf_counter() - start)
+
+    rag_service.HybridRetriever._get_relevant_documents = timed_retrieve
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * pct / 100
+    low, high = int(position), min(int(position) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(values: list[float], elapsed: float = None) -> dict:
+    summary = {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50), 1),
+        "p95_ms": round(percentile(values, 95), 1),
+        "p99_ms": round(percentile(values, 99), 1),
+        "mean_ms": round(statistics.fmean(values), 1) if values else 0.0,
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(values) / elapsed, 2)
+    return summary
+
+
+def print_table(title: str, rows: dict):
+    print(f"\n{title}")
+    print(f"  {'name':<28} {'count':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in rows.items():
+        rps = f"{s['throughput_rps']:.2f}" if "throughput_rps" in s else "-"
+        print(f"  {name:<28} {s['count']:>6} {rps:>8} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+
+
+# --- WORKLOADS ---
+
+def build_mix(args) -> list[dict]:
+    rng = random.Random(args.seed)
+    requests = []
+    for i in range(args.requests):
+        is_audio = rng.random() < args.audio_ratio
+        mode = RAG_MODE if rng.random() < args.rag_ratio else GENERAL_MODE
+        language = rng.choice(INDIC_LANGUAGES) if rng.random() < args.indic_ratio else "en"
+        question = rng.choice(SAMPLE_QUESTIONS if mode == RAG_MODE else GREETINGS)
+        if args.unique_queries:
+            question = f"{question} (#{i})"
+        requests.append({
+            "audio": make_wav(rng.uniform(2, 8), seed=i) if is_audio else None,
+            "text": None if is_audio else question,
+            "mode": mode,
+            "language": language,
+            "label": f"{'audio' if is_audio else 'text'}/{'rag' if mode == RAG_MODE else 'general'}/{'en' if language == 'en' else 'indic'}",
+        })
+    return requests
+
+
+async def run_chat(client: httpx.AsyncClient, requests: list[dict], concurrency: int, recorder: Recorder):
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = defaultdict(int)
+
+    async def one(request):
+        async with semaphore:
+            data = {"language": request["language"], "mode": request["mode"]}
+            files = None
+            if request["audio"] is not None:
+                files = {"audio_file": ("question.wav", request["audio"], "audio/wav")}
+            else:
+                data["text_query"] = request["text"]
+            start = time.perf_counter()
+            response = await client.post("/v2/chat", data=data, files=files)
+            elapsed = time.perf_counter() - start
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                recorder.add("end_to_end", elapsed)
+                recorder.add(f"type:{request['label']}", elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(request) for request in requests))
+    return time.perf_counter() - start, dict(statuses)
+
+
+async def run_aid_centers(client: httpx.AsyncClient, count: int, concurrency: int, recorder: Recorder):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await client.get("/find_aid_centers", params={"city": CITY_QUERIES[i % len(CITY_QUERIES)]})
+            recorder.add("find_aid_centers", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return time.perf_counter() - start
+
+
+def run_ingestion(data_dir: str, workers: int) -> dict:
+    """Times the ingestion stages (page extraction, chunking, embedding, lexical index) without writing a store."""
+    sys.path.insert(0, os.path.join(ROOT, "scripts"))
+    import glob
+    from multiprocessing import Pool
+    import ingest_data_ocr as ingest
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    pdf_paths = sorted(glob.glob(os.path.join(data_dir, "**", "*.pdf"), recursive=True))
+    if not pdf_paths:
+        return {}
+    start = time.perf_counter()
+    with Pool(processes=workers) as pool:
+        pages = [r for r in pool.imap_unordered(ingest.process_page, ingest.page_tasks(pdf_paths, data_dir, {}, ingest.OCR_DPI), chunksize=4)
+                 if r["status"] == "changed"]
+    extract_seconds = time.perf_counter() - start
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=150)
+    start = time.perf_counter()
+    chunks = [ingest.chunk_page(splitter, page) for page in pages]
+    texts = [text for page_texts, _, _ in chunks for text in page_texts]
+    metadatas = [meta for _, page_metas, _ in chunks for meta in page_metas]
+    ids = [i for _, _, page_ids in chunks for i in page_ids]
+    HashEmbeddings().embed_documents(texts)
+    LexicalIndex.build(ids, texts, metadatas)
+    index_seconds = time.perf_counter() - start
+    return {
+        "pages": len(pages),
+        "pages_per_s": round(len(pages) / extract_seconds, 2) if extract_seconds else 0.0,
+        "chunks": len(texts),
+        "chunks_per_s": round(len(texts) / index_seconds, 2) if index_seconds else 0.0,
+    }
+
+
+async def main_async(args):
+    recorder = Recorder()
+    corpus_size = install_stand_ins(args, recorder)
+    print(f"📚 Stand-in corpus: {corpus_size} chunks | requests={args.requests} concurrency={args.concurrency}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        chat_seconds, statuses = await run_chat(client, build_mix(args), args.concurrency, recorder)
+        aid_seconds = await run_aid_centers(client, args.aid_requests, args.concurrency, recorder)
+
+    report = {
+        "config": vars(args),
+        "chat": {
+            "elapsed_s": round(chat_seconds, 2),
+            "statuses": statuses,
+            "end_to_end": summarize(recorder.samples["end_to_end"], chat_seconds),
+            "by_type": {name[5:]: summarize(values) for name, values in sorted(recorder.samples.items()) if name.startswith("type:")},
+            "stages": {name[6:]: summarize(values) for name, values in sorted(recorder.samples.items()) if name.startswith("stage:")},
+        },
+        "find_aid_centers": summarize(recorder.samples["find_aid_centers"], aid_seconds),
+        "caches": {
+            "answers": rag_service.cache_stats(),
+            "translations": translation_service.cache_stats(),
+            "audio": audio_service.cache_stats(),
+        },
+    }
+    if not args.skip_ingestion:
+        report["ingestion"] = run_ingestion(args.data_dir, args.ingest_workers)
+
+    print(f"\nChat: {args.requests} requests in {chat_seconds:.2f}s, statuses {statuses}")
+    print_table("End to end", {"/v2/chat": report["chat"]["end_to_end"], "/find_aid_centers": report["find_aid_centers"]})
+    print_table("By request type", report["chat"]["by_type"])
+    print_table("By stage (includes queueing)", report["chat"]["stages"])
+    if report.get("ingestion"):
+        ing = report["ingestion"]
+        print(f"\nIngestion: {ing['pages']} pages at {ing['pages_per_s']} pages/s, {ing['chunks']} chunks at {ing['chunks_per_s']} chunks/s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_argument_group("load")
+    load.add_argument("--requests", type=int, default=100)
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--aid-requests", type=int, default=500)
+    load.add_argument("--seed", type=int, default=7)
+    mix = parser.add_argument_group("request mix")
+    mix.add_argument("--audio-ratio", type=float, default=0.2, help="Share of audio (vs text) requests.")
+    mix.add_argument("--rag-ratio", type=float, default=0.7, help="Share of RAG (vs general chat) requests.")
+    mix.add_argument("--indic-ratio", type=float, default=0.5, help="Share of non-English requests.")
+    mix.add_argument("--unique-queries", action="store_true", help="Make every query distinct (defeats caches).")
+    mix.add_argument("--no-cache", action="store_true", help="Disable answer, translation and TTS caches.")
+    stand_ins = parser.add_argument_group("stand-in latencies")
+    stand_ins.add_argument("--llm-ms", type=float, default=300.0, help="Time to first token.")
+    stand_ins.add_argument("--token-ms", type=float, default=15.0)
+    stand_ins.add_argument("--answer-tokens", type=int, default=60)
+    stand_ins.add_argument("--translate-ms", type=float, default=120.0, help="Per translation round trip.")
+    stand_ins.add_argument("--tts-ms", type=float, default=150.0, help="Per TTS call.")
+    stand_ins.add_argument("--tts-ms-per-char", type=float, default=1.0)
+    stand_ins.add_argument("--whisper-ms", type=float, default=800.0)
+    stand_ins.add_argument("--embed-ms", type=float, default=5.0)
+    stand_ins.add_argument("--real-whisper", action="store_true", help="Use the real Whisper model (needs ffmpeg and cached weights).")
+    other = parser.add_argument_group("other")
+    other.add_argument("--skip-ingestion", action="store_true")
+    other.add_argument("--data-dir", default=os.path.join(ROOT, "data"))
+    other.add_argument("--ingest-workers", type=int, default=os.cpu_count())
+    other.add_argument("--json", help="Write the full report to this file.")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        executors.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# scripts/benchmark_vector_store.py
+"""
+Compares the Chroma store with the memory-mapped compact index
+(VECTOR_STORE_BACKEND=compact) on startup time, memory, per-query and
+batched search latency, and top-k agreement.
+
+Each backend is opened in a fresh subprocess, so import and open costs and
+RSS are measured cold. Queries are embedded once up front; only the vector
+search itself is timed.
+
+Run from the project root after ingestion:
+    python scripts/benchmark_vector_store.py --queries 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+sys.path.insert(0, SCRIPTS_DIR)
+from app.services.compact_index import COMPACT_INDEX_DIRNAME, CompactVectorStore
+from benchmark_embeddings import SAMPLE_QUERIES, percentile
+
+VECTOR_STORE_PATH = "vector_store"
+COMPACT_INDEX_PATH = os.path.join(VECTOR_STORE_PATH, COMPACT_INDEX_DIRNAME)
+BACKENDS = ("chroma", "compact")
+
+
+def rss_mb() -> float:
+    """Current resident set size, from /proc where available, else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+# --- CHILD (one backend per process) ---
+
+def open_store(backend: str):
+    """Opens the store as the API would; Chroma's import is part of its startup cost."""
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+        return Chroma(persist_directory=VECTOR_STORE_PATH)
+    return CompactVectorStore(COMPACT_INDEX_PATH, embedding=None)
+
+
+def search_batch(store, vectors: list[list[float]], k: int):
+    # The same calls rag_service.search_many makes, without importing the whole service.
+    if isinstance(store, CompactVectorStore):
+        return store.search_many(vectors, k)
+    return store._collection.query(query_embeddings=vectors, n_results=k, include=["documents", "metadatas"])
+
+
+def measure(backend: str, vectors_path: str, k: int, batch: int) -> dict:
+    queries = np.load(vectors_path).tolist()
+    baseline_rss = rss_mb()
+
+    start = time.perf_counter()
+    store = open_store(backend)
+    opened = time.perf_counter()
+    store.similarity_search_by_vector(queries[0], k=k)
+    first = time.perf_counter()
+
+    latencies, results = [], []
+    for vector in queries:
+        query_start = time.perf_counter()
+        docs = store.similarity_search_by_vector(vector, k=k)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+        results.append([(doc.metadata.get("source"), doc.metadata.get("page"), doc.metadata.get("chunk")) for doc in docs])
+
+    batch_latencies = []
+    for offset in range(0, len(queries) - batch + 1, batch):
+        batch_start = time.perf_counter()
+        search_batch(store, queries[offset:offset + batch], k)
+        batch_latencies.append((time.perf_counter() - batch_start) * 1000)
+
+    return {
+        "open_s": opened - start,
+        "first_query_ms": (first - opened) * 1000,
+        "rss_mb": rss_mb() - baseline_rss,
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p95_ms": percentile(latencies, 95),
+        "batch_p50_ms": percentile(batch_latencies, 50) if batch_latencies else float("nan"),
+        "results": results,
+    }
+
+
+# --- PARENT ---
+
+def embed_queries(count: int) -> np.ndarray:
+    from app.services.embedding_service import create_embeddings
+    vectors = np.asarray(create_embeddings().embed_documents(SAMPLE_QUERIES), dtype=np.float32)
+    # Repeats of the sample questions get a small nudge so no two vectors are identical.
+    vectors = vectors[np.arange(count) % len(vectors)]
+    noise = np.random.default_rng(0).normal(scale=0.01 * np.abs(vectors).mean(), size=vectors.shape)
+    noise[:len(SAMPLE_QUERIES)] = 0
+    return (vectors + noise).astype(np.float32)
+
+
+def run_child(backend: str, vectors_path: str, k: int, batch: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", backend,
+         "--vectors", vectors_path, "--k", str(k), "--batch", str(batch)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200, help="Number of single-query searches to time.")
+    parser.add_argument("--k", type=int, default=8, help="Top-k per search (RETRIEVAL_FETCH_K in hybrid mode).")
+    parser.add_argument("--batch", type=int, default=8, help="Queries per batched search_many call.")
+    parser.add_argument("--child", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.vectors, args.k, args.batch)))
+        return
+
+    if not os.path.isdir(COMPACT_INDEX_PATH):
+        print(f"❌ {COMPACT_INDEX_PATH} not found. Run scripts/ingest_data_ocr.py first.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vectors_path = os.path.join(tmp, "queries.npy")
+        np.save(vectors_path, embed_queries(args.queries))
+        print(f"🔎 {args.queries} queries, k={args.k}, batches of {args.batch}")
+        results = {backend: run_child(backend, vectors_path, args.k, args.batch) for backend in BACKENDS}
+
+    print(f"\n{'backend':<9} {'open s':>8} {'first ms':>9} {'RSS MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'batch ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<9} {r['open_s']:>8.3f} {r['first_query_ms']:>9.2f} {r['rss_mb']:>8.1f} "
+              f"{r['query_p50_ms']:>8.3f} {r['query_p95_ms']:>8.3f} {r['batch_p50_ms']:>9.3f}")
+
+    chroma, compact = results["chroma"]["results"], results["compact"]["results"]
+    overlap = np.mean([len(set(map(tuple, a)) & set(map(tuple, b))) / max(1, len(a)) for a, b in zip(chroma, compact)])
+    top1 = np.mean([bool(a) and bool(b) and a[0] == b[0] for a, b in zip(chroma, compact)])
+    print(f"\nAgreement with Chroma: top-1 {top1:.1%}, overlap@{args.k} {overlap:.1%}")
+
+
+if __name__ == "__main__":
+    main()
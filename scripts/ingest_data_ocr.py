@@ -1,90 +1,312 @@
 # scripts/ingest.py
+import argparse
+import glob
+import hashlib
+import json
 import os
+import sys
+import time
+import uuid
+from multiprocessing import Pool
 import fitz  # PyMuPDF
 from PIL import Image
 import pytesseract
 from tqdm import tqdm
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
-from langchain.docstore.document import Document
+
+# Lets `python scripts/ingest_data_ocr.py` import the shared index code from the app package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core import config
+from app.services.compact_index import COMPACT_INDEX_DIRNAME, DTYPES, write_index
+from app.services.embedding_service import create_embeddings
+from app.services.lexical_index import LEXICAL_INDEX_FILENAME, LexicalIndex
 
 # --- CONFIGURATION ---
-DATA_PATH = "data/rti_act_2005.pdf"
+DATA_DIR = "data"
 VECTOR_STORE_PATH = "vector_store"
-# ---> CHANGE 1: Switched to a superior embedding model for better retrieval accuracy <---
-EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+# The API ties its answer cache to this version, so a rebuild invalidates stale answers.
+INDEX_VERSION_FILE = os.path.join(VECTOR_STORE_PATH, "index_version.txt")
+# Per-page content hashes and chunk ids from the previous run, for incremental updates.
+MANIFEST_PATH = os.path.join(VECTOR_STORE_PATH, "ingest_manifest.json")
+# BM25 + section index served next to the vector store for hybrid retrieval.
+LEXICAL_INDEX_PATH = os.path.join(VECTOR_STORE_PATH, LEXICAL_INDEX_FILENAME)
+# Memory-mapped copy of the embeddings for VECTOR_STORE_BACKEND=compact.
+COMPACT_INDEX_PATH = os.path.join(VECTOR_STORE_PATH, COMPACT_INDEX_DIRNAME)
+OCR_DPI = 300
+# Pages with less extractable text than this are treated as scanned and OCR'd.
+MIN_TEXT_CHARS = 150
+# Chunks embedded and upserted per call.
+EMBED_BATCH_SIZE = 256
+
+
+# --- PAGE WORKERS (run in a process pool) ---
+
+_worker_doc = {"path": None, "doc": None}
 
-def process_pdf_with_ocr(file_path: str) -> list[Document]:
+def _open(path: str):
+    # Each worker keeps the PDF it's working on open between pages.
+    if _worker_doc["path"] != path:
+        if _worker_doc["doc"] is not None:
+            _worker_doc["doc"].close()
+        _worker_doc["doc"] = fitz.open(path)
+        _worker_doc["path"] = path
+    return _worker_doc["doc"]
+
+def page_fingerprint(doc, page) -> str:
     """
-    Processes a PDF, attempting to extract text directly first,
-    and falling back to OCR if the text is sparse.
+    Hashes the page's content stream and embedded images. This is cheap
+    (no rendering or OCR) and changes whenever the page does.
     """
-    print(f"🧠 Processing PDF: {file_path}")
-    doc = fitz.open(file_path)
-    all_documents = []
+    digest = hashlib.sha256(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
 
-    for page_num in tqdm(range(len(doc)), desc="Processing PDF pages"):
+def process_page(task: tuple) -> dict:
+    """
+    Extracts one page's text, attempting direct extraction first and falling
+    back to OCR if the text is sparse. Skips the work entirely when the page
+    fingerprint matches the one recorded by the previous run.
+    """
+    path, source, page_num, known_hash, dpi = task
+    result = {"source": source, "page": page_num + 1, "status": "unchanged"}
+    try:
+        doc = _open(path)
         page = doc.load_page(page_num)
-        text = page.get_text("text")
+        result["hash"] = page_fingerprint(doc, page)
+        if result["hash"] == known_hash:
+            return result
 
-        page_content = ""
-        is_scanned = False
-        
-        # If direct text extraction yields little text, use OCR.
-        if len(text.strip()) < 150:
-            is_scanned = True
-            pix = page.get_pixmap(dpi=300)
+        text = page.get_text("text")
+        result["is_scanned"] = len(text.strip()) < MIN_TEXT_CHARS
+        if result["is_scanned"]:
+            pix = page.get_pixmap(dpi=dpi)
             img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            
-            try:
-                page_content = pytesseract.image_to_string(img, lang='eng')
-            except Exception as e:
-                print(f"⚠️ Warning: Tesseract error on page {page_num+1}. Skipping. Error: {e}")
-                continue
-        else:
-            page_content = text
-
-        if page_content:
-            metadata = {
-                "source": os.path.basename(file_path),
-                "page": page_num + 1,
-                "is_scanned": is_scanned
-            }
-            all_documents.append(Document(page_content=page_content, metadata=metadata))
-            
-    doc.close()
-    return all_documents
+            text = pytesseract.image_to_string(img, lang='eng')
+        result["text"] = text
+        result["status"] = "changed"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    return result
 
-def main():
-    print("🚀 Starting data ingestion process...")
-    
-    if not os.path.exists(DATA_PATH):
-        print(f"❌ FATAL ERROR: Document not found at '{DATA_PATH}'. Please add it.")
-        return
 
-    documents = process_pdf_with_ocr(DATA_PATH)
-    if not documents:
-        print(f"❌ No text could be extracted from the document. Halting.")
+# --- MANIFEST ---
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(manifest: dict):
+    os.makedirs(VECTOR_STORE_PATH, exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def new_index_version() -> str:
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def read_index_version() -> str:
+    try:
+        with open(INDEX_VERSION_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+def write_index_version(version: str):
+    """Stamps the vector store with a new version identifier."""
+    os.makedirs(VECTOR_STORE_PATH, exist_ok=True)
+    with open(INDEX_VERSION_FILE, "w", encoding="utf-8") as f:
+        f.write(version)
+    print(f"🏷️ Vector store version: {version}")
+
+
+# --- PIPELINE ---
+
+class ChunkWriter:
+    """Buffers chunks and embeds + upserts them in large batches."""
+
+    def __init__(self, vector_store, batch_size: int):
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.texts, self.metadatas, self.ids = [], [], []
+        self.written = 0
+
+    def add(self, texts, metadatas, ids):
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self.ids.extend(ids)
+        if len(self.texts) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.texts:
+            return
+        # add_texts embeds the whole list in one embed_documents call and upserts by id.
+        self.vector_store.add_texts(texts=self.texts, metadatas=self.metadatas, ids=self.ids)
+        self.written += len(self.texts)
+        self.texts, self.metadatas, self.ids = [], [], []
+
+def chunk_page(splitter, result: dict):
+    """Splits one page into chunks with stable ids derived from its content hash."""
+    metadata = {"source": result["source"], "page": result["page"], "is_scanned": result["is_scanned"]}
+    texts = [text for text in splitter.split_text(result["text"]) if text.strip()]
+    ids = [f"{result['source']}:{result['page']}:{i}:{result['hash'][:16]}" for i in range(len(texts))]
+    return texts, [dict(metadata, chunk=i) for i in range(len(texts))], ids
+
+def build_derived_indexes(vector_store, compact_dtype: str, version: str):
+    """
+    Rebuilds the BM25/section index and the compact vector index from every
+    chunk in the vector store, in one pass over the store. The compact index
+    records `version` so the API's answer cache follows the build it serves.
+    """
+    stored = vector_store.get(include=["documents", "metadatas", "embeddings"])
+    rows = sorted(
+        zip(stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"]),
+        # Document order matters: a section's text can run on into the next chunks.
+        key=lambda row: (row[2].get("source", ""), row[2].get("page", 0), row[2].get("chunk", 0)),
+    )
+    ids = [row[0] for row in rows]
+    texts = [row[1] for row in rows]
+    metadatas = [row[2] for row in rows]
+    index = LexicalIndex.build(ids, texts, metadatas)
+    index.save(LEXICAL_INDEX_PATH)
+    print(f"🔤 Lexical index: {len(ids)} chunks, {len(index.postings)} terms, {sum(map(len, index.sections.values()))} section keys.")
+
+    write_index(COMPACT_INDEX_PATH, ids, texts, metadatas, [row[3] for row in rows], compact_dtype, version)
+    print(f"🗜️ Compact index: {len(ids)} chunks as {compact_dtype} at {COMPACT_INDEX_PATH}.")
+
+def source_name(path: str, data_dir: str) -> str:
+    # Relative to the data directory, so same-named files in different folders don't collide.
+    return os.path.relpath(path, data_dir)
+
+def page_tasks(pdf_paths: list[str], data_dir: str, manifest: dict, dpi: int):
+    for path in pdf_paths:
+        source = source_name(path, data_dir)
+        known_pages = manifest.get(source, {})
+        with fitz.open(path) as doc:
+            page_count = len(doc)
+        for page_num in range(page_count):
+            known = known_pages.get(str(page_num + 1), {})
+            yield (path, source, page_num, known.get("hash"), dpi)
+
+def count_pages(pdf_paths: list[str]) -> int:
+    total = 0
+    for path in pdf_paths:
+        with fitz.open(path) as doc:
+            total += len(doc)
+    return total
+
+def ingest(data_dir: str, workers: int, dpi: int, batch_size: int, rebuild: bool, compact_dtype: str):
+    pdf_paths = sorted(glob.glob(os.path.join(data_dir, "**", "*.pdf"), recursive=True))
+    if not pdf_paths:
+        print(f"❌ FATAL ERROR: No PDF documents found under '{data_dir}'. Please add them.")
         return
-    print(f"✅ Extracted {len(documents)} pages from the document.")
+    print(f"🧠 Found {len(pdf_paths)} PDF(s) under '{data_dir}'.")
+
+    # Fork the page workers before the embedding model and Chroma client load,
+    # so they don't inherit that memory or torch/ONNX thread-pool state. They
+    # only extract text and OCR; the parent chunks, embeds and writes.
+    pool = Pool(processes=workers)
+
+    # The same model and backend the API serves with (EMBEDDING_MODEL / EMBEDDING_BACKEND).
+    embeddings = create_embeddings()
+    vector_store = Chroma(persist_directory=VECTOR_STORE_PATH, embedding_function=embeddings)
+
+    manifest = {} if rebuild else load_manifest()
+    if not manifest and not rebuild and vector_store.get(limit=1)["ids"]:
+        # A store built before manifests existed has no stable chunk ids to update in place.
+        print("⚠️ Existing vector store has no ingest manifest; rebuilding it once.")
+        rebuild = True
+    if rebuild:
+        print("♻️ Rebuilding: dropping the existing collection.")
+        vector_store.reset_collection()
+
+    # Documents that were ingested before but are no longer on disk.
+    current_sources = {source_name(path, data_dir) for path in pdf_paths}
+    removed_ids = []
+    for source in set(manifest) - current_sources:
+        for page in manifest.pop(source).values():
+            removed_ids.extend(page["ids"])
+    if removed_ids:
+        vector_store.delete(ids=removed_ids)
+        print(f"🗑️ Removed {len(removed_ids)} chunks from deleted documents.")
 
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=150)
-    chunks = text_splitter.split_documents(documents)
-    print(f"✅ Split document into {len(chunks)} chunks.")
-
-    print(f"🧠 Loading new embedding model: {EMBEDDING_MODEL} (this may download on first run)...")
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-
-    print(f"💾 Creating and persisting new, smarter vector store at '{VECTOR_STORE_PATH}'...")
-    # This will overwrite the old vector store if it exists
-    vector_store = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=VECTOR_STORE_PATH
-    )
-    
-    print("\n🎉 Ingestion with new embedding model complete! The vector store is ready.")
+    writer = ChunkWriter(vector_store, batch_size)
+    seen_pages = {source: set() for source in current_sources}
+    counts = {"changed": 0, "unchanged": 0, "error": 0, "ocr": 0}
+    # Chunks of changed pages deleted before re-chunking; a page can now yield none.
+    replaced = 0
+    start = time.perf_counter()
+
+    total_pages = count_pages(pdf_paths)
+    with pool:
+        results = pool.imap_unordered(process_page, page_tasks(pdf_paths, data_dir, manifest, dpi), chunksize=4)
+        for result in tqdm(results, total=total_pages, desc="Processing PDF pages", unit="page"):
+            source, page_key = result["source"], str(result["page"])
+            seen_pages[source].add(page_key)
+            counts[result["status"]] += 1
+            if result["status"] == "error":
+                print(f"⚠️ Warning: error on {source} page {page_key}. Skipping. Error: {result['error']}")
+                continue
+            if result["status"] == "unchanged":
+                continue
+
+            old_ids = manifest.get(source, {}).get(page_key, {}).get("ids", [])
+            if old_ids:
+                vector_store.delete(ids=old_ids)
+                replaced += len(old_ids)
+            counts["ocr"] += int(result["is_scanned"])
+            texts, metadatas, ids = chunk_page(text_splitter, result)
+            writer.add(texts, metadatas, ids)
+            manifest.setdefault(source, {})[page_key] = {"hash": result["hash"], "ids": ids}
+        writer.flush()
+
+    # Pages that disappeared from documents which got shorter.
+    stale_ids = []
+    for source, pages in manifest.items():
+        for page_key in set(pages) - seen_pages.get(source, set()):
+            stale_ids.extend(pages.pop(page_key)["ids"])
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+
+    elapsed = time.perf_counter() - start
+    save_manifest(manifest)
+    processed = counts["changed"] + counts["unchanged"] + counts["error"]
+    print(f"✅ {processed} pages in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.2f} pages/s): "
+          f"{counts['changed']} updated ({counts['ocr']} via OCR), {counts['unchanged']} unchanged, "
+          f"{counts['error']} failed.")
+    print(f"✅ Upserted {writer.written} chunks, removed {len(removed_ids) + len(stale_ids)} stale chunks.")
+
+    changed = writer.written or replaced or removed_ids or stale_ids or rebuild
+    version = new_index_version() if changed else read_index_version()
+    if changed or not os.path.exists(LEXICAL_INDEX_PATH) or not os.path.exists(COMPACT_INDEX_PATH):
+        build_derived_indexes(vector_store, compact_dtype, version)
+    if changed:
+        write_index_version(version)
+        print("\n🎉 Ingestion complete! The vector store is ready.")
+    else:
+        print("\n🎉 Nothing changed; the vector store is already up to date.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally ingest legal PDFs into the vector store.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory searched recursively for PDFs.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes used for text extraction and OCR.")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI, help="Render resolution for OCR'd pages.")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks embedded per batch.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the manifest and rebuild the store from scratch.")
+    parser.add_argument("--compact-dtype", default=config.COMPACT_INDEX_DTYPE, choices=DTYPES,
+                        help="Precision of the vectors in the compact index.")
+    args = parser.parse_args()
+
+    print("🚀 Starting data ingestion process...")
+    ingest(args.data_dir, args.workers, args.dpi, args.batch_size, args.rebuild, args.compact_dtype)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,12 @@
 # streamlit_app/app.py
 import streamlit as st
 import requests
-import base64
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 from streamlit_mic_recorder import mic_recorder
 
 # --- PAGE CONFIGURATION & BOT NAME ---
@@ -10,7 +15,16 @@ st.set_page_config(page_title=BOT_NAME, page_icon="⚖️", layout="wide")
 
 # --- API URLS ---
 CHAT_API_URL = "http://127.0.0.1:8000/v2/chat"
+CHAT_STREAM_API_URL = "http://127.0.0.1:8000/v2/chat/stream"
 AID_API_URL = "http://127.0.0.1:8000/find_aid_centers"
+AUDIO_API_URL = "http://127.0.0.1:8000/v2/audio"
+
+# --- CLIENT LIMITS ---
+# Answer audio fetched for the 🔊 buttons, kept in this process across all browser sessions.
+AUDIO_STORE_MAX_BYTES = 64 * 1024 * 1024
+# Minimum time between redraws of a streaming answer.
+RENDER_INTERVAL_SECONDS = 0.05
+AID_CACHE_TTL_SECONDS = 600
 
 # --- LANGUAGE MAPPING ---
 LANGUAGES = {
@@ -18,6 +32,76 @@ LANGUAGES = {
     "தமிழ் (Tamil)": "ta", "తెలుగు (Telugu)": "te", "മലയാളം (Malayalam)": "ml"
 }
 
+# --- SHARED RESOURCES ---
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One pooled, keep-alive HTTP session shared by every rerun and browser session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class AudioStore:
+    """
+    Answer audio keyed by the server's audio ID, bounded by total size (least
+    recently used clips go first). Messages in session_state only hold the
+    ID, so the conversation stays small however long it gets.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, audio_id: str, audio_bytes: bytes):
+        with self._lock:
+            previous = self._clips.pop(audio_id, None)
+            if previous is not None:
+                self.total_bytes -= len(previous)
+            self._clips[audio_id] = audio_bytes
+            self.total_bytes += len(audio_bytes)
+            while self.total_bytes > self.max_bytes and len(self._clips) > 1:
+                _, evicted = self._clips.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def get(self, audio_id: str):
+        with self._lock:
+            audio_bytes = self._clips.get(audio_id)
+            if audio_bytes is not None:
+                self._clips.move_to_end(audio_id)
+            return audio_bytes
+
+
+@st.cache_resource
+def get_audio_store() -> AudioStore:
+    return AudioStore(AUDIO_STORE_MAX_BYTES)
+
+
+def get_answer_audio(audio_id: str):
+    """The answer's MP3, synthesized by the server on first request; None if it has expired."""
+    store = get_audio_store()
+    audio_bytes = store.get(audio_id)
+    if audio_bytes is None:
+        res = get_http_session().get(f"{AUDIO_API_URL}/{audio_id}", timeout=120)
+        if res.status_code == 404:
+            return None
+        res.raise_for_status()
+        audio_bytes = res.content
+        if audio_bytes:
+            store.put(audio_id, audio_bytes)
+    return audio_bytes
+
+
+@st.cache_data(ttl=AID_CACHE_TTL_SECONDS, show_spinner=False)
+def find_aid_centers(city: str):
+    """Cached per city; failures raise and so are not cached."""
+    res = get_http_session().get(AID_API_URL, params={"city": city}, timeout=15)
+    res.raise_for_status()
+    return res.json()
+
 # --- APPLICATION STATE INITIALIZATION ---
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -25,6 +109,9 @@ if "editing_index" not in st.session_state:
     st.session_state.editing_index = None
 if "play_audio" not in st.session_state:
     st.session_state.play_audio = None
+# The server keeps the conversation history under this id.
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 # Set defaults
 if "language_code" not in st.session_state: st.session_state.language_code = "en"
 if "chat_mode" not in st.session_state: st.session_state.chat_mode = "Legal Aid (RAG)"
@@ -32,12 +119,72 @@ if "chat_mode" not in st.session_state: st.session_state.chat_mode = "Legal Aid
 # --- AUDIO PLAYBACK LOGIC ---
 if st.session_state.play_audio:
     try:
-        audio_bytes = base64.b64decode(st.session_state.play_audio)
-        st.audio(audio_bytes, format="audio/mp3", autoplay=True)
-    except Exception as e:
-        st.error(f"Could not play audio. Error: {e}")
+        audio_bytes = get_answer_audio(st.session_state.play_audio)
+        if audio_bytes:
+            st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+        else:
+            st.warning("That answer's audio is no longer available.")
+    except requests.RequestException as e:
+        st.error(f"Could not load the audio: {e}")
     st.session_state.play_audio = None
 
+# --- STREAMING CHAT HELPER ---
+def stream_chat(data, files=None):
+    """
+    Calls the streaming chat endpoint and renders the answer as it arrives.
+    Returns (text_answer, audio_id) once the stream is finished, or
+    (None, None) if it failed. Audio is deferred: it is only synthesized if
+    the user presses 🔊.
+    """
+    placeholder = st.empty()
+    english_draft = ""
+    sentences = []
+    audio_id = None
+    answer = None
+    last_render = 0.0
+
+    def render(text):
+        # Redrawing on every token is what makes long answers sluggish.
+        nonlocal last_render
+        now = time.monotonic()
+        if now - last_render >= RENDER_INTERVAL_SECONDS:
+            placeholder.write(text)
+            last_render = now
+
+    data = {**data, 'audio_mode': 'deferred'}
+    with get_http_session().post(CHAT_STREAM_API_URL, data=data, files=files, stream=True, timeout=180) as response:
+        if response.status_code != 200:
+            st.error("Server error.")
+            return None, None
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "token" and data.get("language") == "en" and not sentences:
+                # Show raw tokens only until the first finished sentence arrives.
+                english_draft += event["text"]
+                render(english_draft + "▌")
+            elif event["type"] == "sentence":
+                sentences.append(event["text"])
+                render(" ".join(sentences) + "▌")
+            elif event["type"] == "error":
+                # Nothing is added to the chat history for a failed answer.
+                placeholder.empty()
+                st.error(f"Server error: {event.get('detail')}")
+                return None, None
+            elif event["type"] == "done":
+                audio_id = event.get("audio_id")
+                # The server's text keeps the answer's line breaks; the sentence events don't.
+                answer = event.get("text_answer")
+                break
+    text_answer = answer or " ".join(sentences)
+    if not text_answer:
+        placeholder.empty()
+        st.error("Server error: the answer was empty.")
+        return None, None
+    placeholder.write(text_answer)
+    return text_answer, audio_id
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.title("Settings")
@@ -51,16 +198,14 @@ with st.sidebar:
         with st.spinner("Searching..."):
             if city_input:
                 try:
-                    res = requests.get(AID_API_URL, params={"city": city_input})
-                    if res.status_code == 200:
-                        data = res.json()
-                        if isinstance(data, list) and data:
-                            for center in data:
-                                st.success(f"**{center['name']}**")
-                                st.write(f"📍 {center['address']}\n\n📞 {center['phone_number']}")
-                                st.divider()
-                        else: st.warning(f"No centers found for '{city_input}'.")
-                    else: st.error("Server error.")
+                    data = find_aid_centers(city_input.strip())
+                    if isinstance(data, list) and data:
+                        for center in data:
+                            st.success(f"**{center['name']}**")
+                            st.write(f"📍 {center['address']}\n\n📞 {center['phone_number']}")
+                            st.divider()
+                    else: st.warning(f"No centers found for '{city_input}'.")
+                except requests.HTTPError: st.error("Server error.")
                 except requests.RequestException: st.error("Connection failed.")
             else: st.warning("Please enter a city name.")
     st.divider()
@@ -86,6 +231,8 @@ for i, msg in enumerate(st.session_state.messages):
                     if (i + 1) < len(st.session_state.messages) and st.session_state.messages[i+1]["role"] == "assistant":
                         del st.session_state.messages[i+1]
                     st.session_state.editing_index = None
+                    # The server's copy of the conversation no longer matches; start a new one.
+                    st.session_state.session_id = uuid.uuid4().hex
                     st.rerun() # Rerun to exit edit mode and trigger a new response
                 if cancel_col.button("❌ Cancel", key=f"cancel_{i}"):
                     st.session_state.editing_index = None
@@ -103,14 +250,15 @@ for i, msg in enumerate(st.session_state.messages):
                     del st.session_state.messages[i]
                     if i < len(st.session_state.messages) and st.session_state.messages[i]["role"] == "assistant":
                         del st.session_state.messages[i]
+                    st.session_state.session_id = uuid.uuid4().hex
                     st.rerun()
         # Handling for Assistant messages
         else:
             col1, col2 = st.columns([0.9, 0.1])
             col1.write(msg.get("content", ""))
-            if msg.get("audio_base64"):
+            if msg.get("audio_id"):
                 if col2.button("🔊", key=f"play_{i}", help="Read aloud"):
-                    st.session_state.play_audio = msg["audio_base64"]
+                    st.session_state.play_audio = msg["audio_id"]
                     st.rerun()
 
 # This block checks if the last message in the state is a user message needing a response.
@@ -120,22 +268,18 @@ if st.session_state.messages and st.session_state.messages[-1]["role"] == "user"
     # Check if this user message already has an assistant response after it
     if len(st.session_state.messages) < 2 or st.session_state.messages[-2] != user_message:
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    response = requests.post(
-                        CHAT_API_URL,
-                        data={'language': st.session_state.language_code, 'mode': st.session_state.chat_mode, 'text_query': user_message['content']},
-                        timeout=180
-                    )
-                    if response.status_code == 200:
-                        response_data = response.json()
-                        text_answer = response_data.get("text_answer", "Error.")
-                        audio_base64 = response_data.get("audio_answer_base64")
-                        st.write(text_answer)
-                        # Add new assistant message to state
-                        st.session_state.messages.append({"role": "assistant", "content": text_answer, "audio_base64": audio_base64})
-                except Exception as e:
-                    st.error(f"Connection error: {e}")
+            try:
+                text_answer, audio_id = stream_chat(
+                    data={
+                        'language': st.session_state.language_code, 'mode': st.session_state.chat_mode,
+                        'session_id': st.session_state.session_id, 'text_query': user_message['content']
+                    }
+                )
+                if text_answer is not None:
+                    # Add new assistant message to state
+                    st.session_state.messages.append({"role": "assistant", "content": text_answer, "audio_id": audio_id})
+            except Exception as e:
+                st.error(f"Connection error: {e}")
 
 # Handle new user input from chat box
 if prompt := st.chat_input("Ask your question..."):
@@ -149,21 +293,17 @@ if audio_input:
         st.audio(audio_input['bytes'])
     
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                response = requests.post(
-                    CHAT_API_URL,
-                    data={'language': st.session_state.language_code, 'mode': st.session_state.chat_mode},
-                    files={'audio_file': audio_input['bytes']},
-                    timeout=180
-                )
-                if response.status_code == 200:
-                    response_data = response.json()
-                    text_answer = response_data.get("text_answer", "Error.")
-                    audio_base64 = response_data.get("audio_answer_base64")
-                    st.write(text_answer)
-                    # Add both user and assistant messages to state
-                    st.session_state.messages.append({"role": "user", "content": "[Audio Question]"})
-                    st.session_state.messages.append({"role": "assistant", "content": text_answer, "audio_base64": audio_base64})
-            except Exception as e:
-                st.error(f"Connection error: {e}")
\ No newline at end of file
+        try:
+            text_answer, audio_id = stream_chat(
+                data={
+                    'language': st.session_state.language_code, 'mode': st.session_state.chat_mode,
+                    'session_id': st.session_state.session_id
+                },
+                files={'audio_file': audio_input['bytes']}
+            )
+            if text_answer is not None:
+                # Add both user and assistant messages to state
+                st.session_state.messages.append({"role": "user", "content": "[Audio Question]"})
+                st.session_state.messages.append({"role": "assistant", "content": text_answer, "audio_id": audio_id})
+        except Exception as e:
+            st.error(f"Connection error: {e}")
\ No newline at end of file
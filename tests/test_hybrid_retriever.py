@@ -0,0 +1,57 @@
+# tests/test_hybrid_retriever.py
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain_core.documents import Document
+
+from app.core import config
+from app.services import rag_service
+from app.services.lexical_index import LexicalIndex
+
+RTI = "rti.pdf"
+
+CHUNKS = [
+    "6. Request for obtaining information.—(1) A person who desires information shall apply in writing.",
+    "The fee for a request for information under section 6 is ten rupees, payable in cash.",
+    "Every public authority shall publish the fee for a request for information.",
+]
+
+
+class AgreeingVectorStore:
+    """Dense search that ranks the same non-section chunk first as BM25 does."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def similarity_search(self, query, k=4):
+        self.calls += 1
+        return [Document(page_content=text, metadata={"source": RTI}) for text in (CHUNKS[1], CHUNKS[2])][:k]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = LexicalIndex.build(
+        [f"{RTI}:{i}" for i in range(len(CHUNKS))], CHUNKS, [{"source": RTI, "chunk": i} for i in range(len(CHUNKS))]
+    )
+    monkeypatch.setattr(rag_service, "get_lexical_index", lambda: index)
+    monkeypatch.setattr(config, "RETRIEVAL_BATCHING", False)
+    return index
+
+
+def test_section_reference_returns_the_section_chunk_without_dense_search(index):
+    store = AgreeingVectorStore()
+    retriever = rag_service.HybridRetriever(vector_store=store, k=2, fetch_k=8)
+    # BM25 and dense search both put chunk 1 ("fee ... request for information") first.
+    assert index.search("What is the fee for a request for information under Section 6(1)?", 1)[0][0] == 1
+    docs = retriever.invoke("What is the fee for a request for information under Section 6(1)?")
+    assert [doc.page_content for doc in docs] == [CHUNKS[0]]
+    assert store.calls == 0
+
+
+def test_other_queries_fuse_dense_and_bm25(index):
+    store = AgreeingVectorStore()
+    retriever = rag_service.HybridRetriever(vector_store=store, k=2, fetch_k=8)
+    docs = retriever.invoke("What is the fee for a request for information?")
+    assert [doc.page_content for doc in docs] == [CHUNKS[1], CHUNKS[2]]
+    assert store.calls == 1
@@ -0,0 +1,145 @@
+# tests/test_lexical_index.py
+import json
+
+from app.services.lexical_index import LexicalIndex, parse_section_reference, tokenize
+
+RTI = "rti.pdf"
+CPA = "consumer.pdf"
+
+
+def build(chunks):
+    """chunks: [(source, text), ...] in document order."""
+    ids = [f"{source}:{i}" for i, (source, _) in enumerate(chunks)]
+    metadatas = [{"source": source, "page": 1, "chunk": i} for i, (source, _) in enumerate(chunks)]
+    return LexicalIndex.build(ids, [text for _, text in chunks], metadatas)
+
+
+# --- PARSING ---
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What is the fee, under Section 6?") == ["fee", "section", "6"]
+
+
+def test_parse_section_reference_forms():
+    assert parse_section_reference("What does Section 6(1) say?") == ("6", "1")
+    assert parse_section_reference("explain sec. 8") == ("8", None)
+    assert parse_section_reference("s. 7 (3) deadline") == ("7", "3")
+    assert parse_section_reference("s 7 (3) deadline") == ("7", "3")
+    assert parse_section_reference("It's 30 days") is None
+    assert parse_section_reference("section 4a") == ("4A", None)
+    assert parse_section_reference("How do I file an RTI?") is None
+
+
+def test_sections_and_subsections_within_a_chunk():
+    index = build([
+        (RTI, "6. Request for obtaining information.—(1) A person who desires information shall apply.\n"
+              "(2) An applicant shall not be required to give any reason."),
+    ])
+    assert index.sections[RTI]["6"] == [0]
+    assert index.sections[RTI]["6(1)"] == [0]
+    assert index.sections[RTI]["6(2)"] == [0]
+
+
+def test_subsections_before_the_first_heading_belong_to_the_carried_section():
+    index = build([
+        (RTI, "6. Request for obtaining information.—(1) A person who desires information shall apply."),
+        (RTI, "(3) Where an application is made to a public authority, it shall transfer it.\n"
+              "7. Disposal of request.—(1) The officer shall decide within thirty days."),
+    ])
+    assert index.sections[RTI]["6"] == [0, 1]
+    assert index.sections[RTI]["6(3)"] == [1]
+    assert index.sections[RTI]["7(1)"] == [1]
+    assert "7(3)" not in index.sections[RTI]
+
+
+def test_schedule_ends_the_last_section():
+    index = build([
+        (RTI, "31. Repeal.—The Freedom of Information Act, 2002 is hereby repealed."),
+        (RTI, "THE FIRST SCHEDULE\n(1) Form of oath to be made by the Chief Information Commissioner."),
+        (RTI, "(2) Form of affirmation."),
+    ])
+    assert index.sections[RTI]["31"] == [0, 1]
+    assert "31(2)" not in index.sections[RTI]
+
+
+def test_sections_are_kept_per_source():
+    index = build([
+        (CPA, "6. Objects of the Central Council.—(1) The objects shall be to promote consumer rights."),
+        (CPA, "(2) The Council shall meet as and when necessary."),
+        (RTI, "6. Request for obtaining information.—(1) A person who desires information shall apply."),
+    ])
+    assert index.sections[CPA]["6"] == [0, 1]
+    assert index.sections[RTI]["6"] == [2]
+    # Nothing else in the question to go on: source order.
+    assert index.lookup_section("What is Section 6?") == [0, 1, 2]
+    assert index.lookup_section("Section 6(2)") == [1, 2]
+
+
+def test_rest_of_the_question_picks_the_act():
+    index = build([
+        (CPA, "6. Objects of the Central Council.—(1) The objects shall be to promote consumer rights."),
+        (CPA, "(2) The Council shall meet as and when necessary."),
+        (RTI, "6. Request for obtaining information.—(1) A person who desires information shall apply."),
+        (RTI, "Information about the request fee is published by every public authority."),
+    ])
+    assert index.lookup_section("Section 6 on obtaining information") == [2, 3, 0, 1]
+    assert index.lookup_section("Section 6 of the consumer law") == [0, 1, 2, 3]
+
+
+def test_unknown_subsection_falls_back_to_the_section():
+    index = build([(RTI, "6. Request for obtaining information.—(1) A person shall apply.")])
+    assert index.lookup_section("section 6(9)") == [0]
+    assert index.lookup_section("section 9") == []
+    assert index.lookup_section("no reference here") == []
+
+
+# --- BM25 ---
+
+def test_bm25_ranks_matching_chunks_by_relevance():
+    index = build([
+        (RTI, "The fee for an application is ten rupees."),
+        (RTI, "The Commission shall consist of a Chief Information Commissioner."),
+        (RTI, "An appeal lies to the Commission; the appeal fee is nil."),
+    ])
+    results = index.search("appeal fee", k=3)
+    assert [doc for doc, _ in results] == [2, 0]
+    assert results[0][1] > results[1][1] > 0
+    assert index.search("fee", k=1) == index.search("fee", k=3)[:1]
+
+
+def test_bm25_prefers_shorter_chunks_for_equal_term_frequency():
+    index = build([
+        (RTI, "penalty " + "filler words about unrelated procedure " * 10),
+        (RTI, "penalty of two hundred fifty rupees"),
+    ])
+    assert [doc for doc, _ in index.search("penalty", k=2)] == [1, 0]
+
+
+def test_bm25_with_no_matches_or_no_chunks():
+    assert build([(RTI, "The fee is ten rupees.")]).search("commission", k=2) == []
+    assert build([]).search("fee", k=2) == []
+
+
+# --- PERSISTENCE ---
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build([
+        (RTI, "6. Request for obtaining information.—(1) A person shall apply."),
+        (CPA, "6. Objects of the Central Council.—(1) To promote consumer rights."),
+    ])
+    path = tmp_path / "lexical_index.json"
+    index.save(str(path))
+    loaded = LexicalIndex.load(str(path))
+    assert loaded.sections == index.sections
+    assert loaded.search("consumer rights", k=2) == index.search("consumer rights", k=2)
+    assert loaded.lookup_section("Section 6(1)") == index.lookup_section("Section 6(1)")
+
+
+def test_load_index_written_before_sections_were_per_source(tmp_path):
+    index = build([(RTI, "6. Request for obtaining information.—(1) A person shall apply.")])
+    path = tmp_path / "lexical_index.json"
+    index.save(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["sections"] = data["sections"][RTI]
+    path.write_text(json.dumps(data), encoding="utf-8")
+    assert LexicalIndex.load(str(path)).lookup_section("section 6(1)") == [0]
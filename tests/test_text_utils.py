@@ -0,0 +1,55 @@
+# tests/test_text_utils.py
+from app.core.text_utils import SentenceSplitter, split_sentences
+
+
+def stream(text: str, step: int = 1) -> SentenceSplitter:
+    """Feeds `text` in small pieces, as the LLM stream does."""
+    splitter = SentenceSplitter()
+    splitter.sentences = []
+    for start in range(0, len(text), step):
+        splitter.sentences += splitter.feed(text[start:start + step])
+    splitter.sentences += splitter.flush()
+    return splitter
+
+
+def test_splits_on_sentence_ends_and_newlines():
+    assert split_sentences("You can file an RTI online. The reply is due in thirty days!\nAppeals go to the FAA.") == [
+        "You can file an RTI online.", "The reply is due in thirty days!", "Appeals go to the FAA.",
+    ]
+
+
+def test_does_not_split_after_abbreviations():
+    assert split_sentences("Section 6. The fee is Rs. 10. You can pay by cash.") == [
+        "Section 6. The fee is Rs. 10.", "You can pay by cash.",
+    ]
+    assert split_sentences("Dr. Rao heads the Commission. Read S. 19(3) of the Act, e.g. for second appeals.") == [
+        "Dr. Rao heads the Commission.", "Read S. 19(3) of the Act, e.g. for second appeals.",
+    ]
+
+
+def test_no_is_an_abbreviation_only_before_a_number():
+    assert split_sentences("Is there a fee for BPL applicants? No. They only need proof of BPL status.") == [
+        "Is there a fee for BPL applicants?", "No. They only need proof of BPL status.",
+    ]
+    assert split_sentences("Use Form No. 5 for the first appeal.") == ["Use Form No. 5 for the first appeal."]
+
+
+def test_numbered_markers_stay_with_their_step():
+    assert split_sentences("Follow these steps to apply:\n1. Write the application.\n2. Pay the fee of Rs. 10.") == [
+        "Follow these steps to apply:", "1. Write the application.", "2. Pay the fee of Rs. 10.",
+    ]
+
+
+def test_streaming_matches_splitting_the_whole_text():
+    text = "The fee is Rs. 10. Use Form No. 5 when you apply. Is it refundable? No. It is not refundable at all."
+    for step in (1, 3, 7):
+        assert stream(text, step).sentences == split_sentences(text)
+
+
+def test_join_restores_line_breaks():
+    text = "Follow these steps to apply:\n1. Write the application.\n2. Pay the fee at the counter. Keep the receipt safely.\n\nThat is all for now."
+    splitter = stream(text)
+    assert splitter.separators == ["\n", "\n", " ", "\n\n", ""]
+    assert splitter.join(splitter.sentences) == text
+    # Translated sentences are rejoined the same way.
+    assert splitter.join([s.upper() for s in splitter.sentences]) == text.upper()